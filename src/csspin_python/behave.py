@@ -22,10 +22,23 @@ import contextlib
 import sys
 from typing import Generator, Iterable
 
-from csspin import config, die, info, option, rmtree, setenv, sh, task, writetext
+from csspin import (
+    config,
+    die,
+    info,
+    interpolate1,
+    option,
+    rmtree,
+    setenv,
+    sh,
+    task,
+    writetext,
+)
 from csspin.tree import ConfigTree
 from path import Path
 
+from csspin_python.python import behave_durations, record_test_durations, span
+
 defaults = config(
     # Exclude the flaky tests in the defaults for now.
     # Will switch the default back to True as soon as
@@ -81,16 +94,18 @@ def with_coverage(cfg: ConfigTree) -> Generator[None, None, None]:
     coverage_pth = ""
     try:
 
-        sh("coverage", "erase", check=False)
+        with span("coverage erase", "sh"):
+            sh("coverage", "erase", check=False)
         setenv(COVERAGE_PROCESS_START=cfg.behave.cov_config)
         coverage_pth = create_coverage_pth(cfg)
         yield
     finally:
         setenv(COVERAGE_PROCESS_START=None)
         rmtree(coverage_pth)
-        sh("coverage", "combine", check=False)
-        sh("coverage", "report", check=False)
-        sh("coverage", "xml", "-o", cfg.behave.cov_report, check=False)
+        with span("coverage report", "sh"):
+            sh("coverage", "combine", check=False)
+            sh("coverage", "report", check=False)
+            sh("coverage", "xml", "-o", cfg.behave.cov_report, check=False)
 
 
 @task(when="cept")
@@ -122,6 +137,12 @@ def behave(  # pylint: disable=too-many-arguments,too-many-positional-arguments
     coverage_enabled = coverage or cfg.behave.coverage
     coverage_context = with_coverage if coverage_enabled else contextlib.nullcontext
     opts = cfg.behave.opts
+    report = (
+        with_test_report
+        and cfg.behave.report.name
+        and cfg.behave.report.format
+        and cfg.behave.report.format.startswith("json")
+    )
     if not cfg.behave.flaky:
         opts.append("--tags=~flaky")
     if with_test_report and cfg.behave.report.name and cfg.behave.report.format:
@@ -138,13 +159,16 @@ def behave(  # pylint: disable=too-many-arguments,too-many-positional-arguments
         cmd = ["powerscript"]
         if debug:
             cmd.append("--debugpy")
-
-        with coverage_context(cfg):
-            sh(*cmd, "-m", "behave", *opts, *args, *cfg.behave.tests)
     else:
         cmd = ["python"]
         if debug:
             cmd = ["debugpy"] + cfg.debugpy.opts
 
-        with coverage_context(cfg):
+    try:
+        with coverage_context(cfg), span("behave", "sh"):
             sh(*cmd, "-m", "behave", *opts, *args, *cfg.behave.tests)
+    finally:
+        if report:
+            record_test_durations(
+                cfg, "behave", behave_durations(interpolate1(cfg.behave.report.name))
+            )
@@ -23,6 +23,8 @@ from typing import Iterable
 from csspin import Command, config, die, exists, readyaml, setenv, sh, task
 from csspin.tree import ConfigTree
 
+from csspin_python.python import span
+
 defaults = config(
     formats=["bdist_wheel"],
     url=None,
@@ -58,16 +60,19 @@ def upload(cfg: ConfigTree) -> None:
     if data.get("index") != (url := cfg.devpi.url):
         if url == "None":
             die("devpi.url not provided!")
-        devpi_("use", "-t", "yes", url)
+        with span("devpi use", "sh"):
+            devpi_("use", "-t", "yes", url)
 
-    devpi_("login", cfg.devpi.user)
-    devpi_(
-        "upload",
-        "-p",
-        cfg.python.python,
-        "--no-vcs",
-        f"--wheel={','.join(cfg.devpi.formats)}",
-    )
+    with span("devpi login", "sh"):
+        devpi_("login", cfg.devpi.user)
+    with span("devpi upload", "sh"):
+        devpi_(
+            "upload",
+            "-p",
+            cfg.python.python,
+            "--no-vcs",
+            f"--wheel={','.join(cfg.devpi.formats)}",
+        )
 
 
 @task()
@@ -78,8 +83,11 @@ def devpi(cfg: ConfigTree, args: Iterable[str]) -> None:
 
     """
     if cfg.devpi.url:
-        sh("devpi", "use", cfg.devpi.url)
+        with span("devpi use", "sh"):
+            sh("devpi", "use", cfg.devpi.url)
     if cfg.devpi.user:
-        sh("devpi", "login", cfg.devpi.user)
+        with span("devpi login", "sh"):
+            sh("devpi", "login", cfg.devpi.user)
 
-    sh("devpi", *args)
+    with span("devpi", "sh"):
+        sh("devpi", *args)
@@ -19,9 +19,24 @@
 
 from typing import Iterable
 
-from csspin import Path, Verbosity, config, die, option, setenv, sh, task, warn
+from csspin import (
+    Path,
+    Verbosity,
+    config,
+    die,
+    interpolate1,
+    option,
+    setenv,
+    sh,
+    task,
+    warn,
+    writetext,
+)
 from csspin.tree import ConfigTree
 
+from csspin_python.pytest import collect_tests, shard_tests
+from csspin_python.python import junit_durations, record_test_durations, span
+
 defaults = config(
     browsers_path="{spin.data}/playwright_browsers",
     browsers=["chromium"],
@@ -74,6 +89,11 @@ def playwright(  # pylint: disable=too-many-arguments,too-many-positional-argume
         is_flag=True,
         help="Create a test execution report.",  # noqa: F722
     ),
+    shard: option(  # type: ignore[valid-type]
+        "--shard",  # noqa: F821
+        default=None,
+        help="Only run the INDEX-th of TOTAL balanced parts of the tests.",  # noqa: F722
+    ),
     args: Iterable[str],
 ) -> None:
     """Run the playwright tests with pytest."""
@@ -121,17 +141,38 @@ def playwright(  # pylint: disable=too-many-arguments,too-many-positional-argume
             die(f"Cannot find CE instance '{inst}'.")
 
         setenv(CADDOK_BASE=inst)
-        sh(*cmd, *opts, *args, *cfg.playwright.tests)
-    else:
-        sh(*cmd, *opts, *args, *cfg.playwright.tests)
+
+    selection = [*args, *cfg.playwright.tests]
+    if shard:
+        if not (
+            tests := shard_tests(
+                cfg, "playwright", shard, collect_tests(cfg, opts, selection)
+            )
+        ):
+            return
+        writetext("{spin.spin_dir}/playwright_shard.args", "\n".join(tests))
+        selection = ["@{spin.spin_dir}/playwright_shard.args"]
+    try:
+        with span("playwright", "sh"):
+            sh(*cmd, *opts, *selection)
+    finally:
+        # All shards must be balanced by the same durations, thus shards
+        # don't record their own.
+        if with_test_report and cfg.playwright.test_report and not shard:
+            record_test_durations(
+                cfg,
+                "playwright",
+                junit_durations([interpolate1(cfg.playwright.test_report)]),
+            )
 
 
 def _download_playwright_browsers(cfg: ConfigTree) -> None:
     """Let playwright install the browsers"""
-    sh(
-        f"playwright install {' '.join(cfg.playwright.browsers)}",
-        env={"PLAYWRIGHT_BROWSERS_PATH": cfg.playwright.browsers_path},
-    )
+    with span("playwright install", "sh"):
+        sh(
+            f"playwright install {' '.join(cfg.playwright.browsers)}",
+            env={"PLAYWRIGHT_BROWSERS_PATH": cfg.playwright.browsers_path},
+        )
 
 
 def finalize_provision(cfg: ConfigTree) -> None:
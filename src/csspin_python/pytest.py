@@ -18,11 +18,53 @@
 """Module implementing the pytest plugin for spin"""
 
 
-from typing import Iterable
+import functools
+import heapq
+import json
+import os
+import re
+import sqlite3
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from fnmatch import fnmatch
+from subprocess import STDOUT, run
+from typing import Any, Generator, Iterable, Union
+from xml.etree import ElementTree  # nosec: blacklist
 
-from csspin import Path, Verbosity, config, die, interpolate1, option, setenv, sh, task
+from click.exceptions import Abort
+from csspin import (
+    Path,
+    Verbosity,
+    backtick,
+    config,
+    die,
+    echo,
+    exists,
+    info,
+    interpolate1,
+    mkdir,
+    option,
+    readtext,
+    rmtree,
+    setenv,
+    sh,
+    task,
+    writetext,
+)
 from csspin.tree import ConfigTree
 
+from csspin_python.python import (
+    _file_hash,
+    junit_durations,
+    load_test_durations,
+    record_test_durations,
+    span,
+)
+
 defaults = config(
     coverage=False,
     coverage_opts=[
@@ -36,6 +78,24 @@ defaults = config(
     opts=[],
     tests=["cs", "tests"],  # Strong convention @CONTACT
     test_report="pytest.xml",
+    workers=1,
+    worker_dir="{spin.spin_dir}/pytest_workers",
+    impact=config(
+        path="{spin.spin_dir}/pytest_impact.json",
+        triggers=[
+            "conftest.py",
+            "pyproject.toml",
+            "setup.cfg",
+            "setup.py",
+            "pytest.ini",
+            "tox.ini",
+            "requirements*.txt",
+        ],
+    ),
+    watch=config(
+        interval=1.0,
+        debounce=0.5,
+    ),
     playwright=config(
         enabled=False,
         browsers_path="{spin.data}/playwright_browsers",
@@ -57,10 +117,11 @@ defaults = config(
 
 def _install_playwright_browsers(cfg: ConfigTree) -> None:
     """Let playwright install the browsers"""
-    sh(
-        f"playwright install {' '.join(cfg.pytest.playwright.browsers)}",
-        env={"PLAYWRIGHT_BROWSERS_PATH": cfg.pytest.playwright.browsers_path},
-    )
+    with span("playwright install", "sh"):
+        sh(
+            f"playwright install {' '.join(cfg.pytest.playwright.browsers)}",
+            env={"PLAYWRIGHT_BROWSERS_PATH": cfg.pytest.playwright.browsers_path},
+        )
 
 
 def configure(cfg: ConfigTree) -> None:
@@ -96,16 +157,34 @@ def pytest(  # pylint: disable=too-many-arguments,too-many-positional-arguments
         is_flag=True,
         help="Create a test execution report.",  # noqa: F722
     ),
+    jobs: option(  # type: ignore[valid-type]
+        "-j",  # noqa: F821
+        "--jobs",  # noqa: F821
+        type=int,
+        default=None,
+        help="Number of worker processes, 0 for one per CPU.",  # noqa: F722
+    ),
+    affected: option(  # type: ignore[valid-type]
+        "--affected",  # noqa: F821
+        is_flag=True,
+        help="Only run the tests affected by changes since the last run.",  # noqa: F722
+    ),
+    shard: option(  # type: ignore[valid-type]
+        "--shard",  # noqa: F821
+        default=None,
+        help="Only run the INDEX-th of TOTAL balanced parts of the tests.",  # noqa: F722
+    ),
+    watch: option(  # type: ignore[valid-type]
+        "--watch",  # noqa: F821
+        is_flag=True,
+        help="Run the affected tests again whenever files change.",  # noqa: F722
+    ),
     args: Iterable[str],
 ) -> None:
     """Run the 'pytest' command."""
     opts = cfg.pytest.opts
     if cfg.verbosity == Verbosity.QUIET:
         opts.append("-q")
-    if with_test_report and cfg.pytest.test_report:
-        opts.append(f"--junitxml={cfg.pytest.test_report}")
-    if coverage or cfg.pytest.coverage:
-        opts.extend(cfg.pytest.coverage_opts)
     if debug:
         cmd = f"debugpy {' '.join(cfg.debugpy.opts)} -m pytest".split()
     else:
@@ -132,6 +211,551 @@ def pytest(  # pylint: disable=too-many-arguments,too-many-positional-arguments
             die(f"Cannot find CE instance '{inst}'.")
 
         setenv(CADDOK_BASE=inst)
-        sh(*cmd, *opts, *args, *cfg.pytest.tests)
+
+    coverage = coverage or cfg.pytest.coverage
+    workers = int(cfg.pytest.workers if jobs is None else jobs) or os.cpu_count() or 1
+    run_tests = functools.partial(
+        _run_tests,
+        cfg,
+        cmd,
+        selection=[*args, *cfg.pytest.tests],
+        coverage=coverage,
+        with_test_report=with_test_report,
+        shard=shard,
+        workers=1 if debug else workers,
+    )
+    if not watch:
+        run_tests(opts, affected=affected)
+        return
+
+    # Run the tests that failed before first
+    opts.append("--ff")
+    changes = watch_changes(cfg, _snapshot(cfg))
+    try:
+        while True:
+            try:
+                run_tests(list(opts), affected=True)
+            except Abort:
+                pass
+            echo("Waiting for changes, press Ctrl+C to stop.")
+            echo(f"Changed: {', '.join(sorted(next(changes)))}")
+    except KeyboardInterrupt:
+        echo("Stopped watching.")
+    finally:
+        changes.close()
+
+
+def _run_tests(  # pylint: disable=too-many-arguments,too-many-locals
+    cfg: ConfigTree,
+    cmd: list[str],
+    opts: list[str],
+    *,
+    selection: list[str],
+    coverage: bool,
+    with_test_report: bool,
+    affected: bool,
+    shard: Union[str, None],
+    workers: int,
+) -> None:
+    """
+    Run the tests selected by `selection`, restricted to the tests affected
+    by changes and to the tests of `shard` if requested, in `workers`
+    processes.
+    """
+    tests = None
+    # Whether to update the impact map only for the tests run, None for not
+    # recording the impact at all
+    partial = None
+    if shard:
+        # All tests are sharded before selecting the affected ones, as the
+        # impact maps of the nodes may differ.
+        if not (
+            tests := shard_tests(
+                cfg, "pytest", shard, collect_tests(cfg, opts, selection)
+            )
+        ):
+            return
+    if affected:
+        if tests is None:
+            tests = collect_tests(cfg, opts, selection)
+        if (selected := affected_tests(cfg, tests)) is None:
+            echo("The impact map is missing or outdated, running all tests.")
+        elif not selected:
+            echo("No tests are affected by the changes.")
+            return
+        else:
+            echo(
+                f"Running {len(selected)} of {len(tests)} tests affected by the changes."
+            )
+            tests = selected
+        partial = selected is not None
+        # Record which tests touch which files for the next run
+        opts.extend(["--cov-context=test", f"--cov={cfg.spin.project_root}"])
+        if not coverage:
+            opts.append("--cov-report=")
+
+    if workers > 1:
+        _run_workers(
+            cfg,
+            workers,
+            opts,
+            tests or collect_tests(cfg, opts, selection),
+            coverage,
+            with_test_report,
+            partial,
+            record_durations=not shard,
+        )
+        return
+
+    if with_test_report and cfg.pytest.test_report:
+        opts.append(f"--junitxml={cfg.pytest.test_report}")
+    if coverage:
+        opts.extend(cfg.pytest.coverage_opts)
+    env = None
+    if tests is not None:
+        worker_dir = mkdir(cfg.pytest.worker_dir)
+        writetext(worker_dir / "selection.args", "\n".join(tests))
+        selection = [f"@{worker_dir / 'selection.args'}"]
+    if partial is not None:
+        env = {"COVERAGE_FILE": str(worker_dir / ".coverage.impact")}
+    try:
+        with span("pytest", "sh"):
+            sh(*cmd, *opts, *selection, env=env)
+    finally:
+        # All shards must be balanced by the same durations, thus shards
+        # don't record their own.
+        if with_test_report and cfg.pytest.test_report and not shard:
+            record_test_durations(
+                cfg,
+                "pytest",
+                junit_durations([interpolate1(cfg.pytest.test_report)]),
+            )
+    if partial is not None:
+        _record_impact(cfg, [worker_dir / ".coverage.impact"], partial)
+
+
+def _run_workers(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    cfg: ConfigTree,
+    workers: int,
+    opts: list[str],
+    tests: list[str],
+    coverage: bool,
+    with_test_report: bool,
+    partial: Union[bool, None] = None,
+    record_durations: bool = True,
+) -> None:
+    """
+    Run `tests` in `workers` pytest processes. The tests are distributed to
+    the workers by their recorded durations, so that all workers finish at
+    about the same time. The test reports and the coverage data of the
+    workers are merged afterwards and the durations are recorded if
+    `record_durations` is set. Unless `partial` is None, the impact map is
+    updated if all tests passed.
+    """
+    buckets = [
+        bucket
+        for bucket in partition(tests, load_test_durations(cfg, "pytest"), workers)
+        if bucket
+    ]
+    worker_dir = Path(interpolate1(cfg.pytest.worker_dir))
+    rmtree(worker_dir)
+    mkdir(worker_dir)
+
+    worker_opts = list(opts)
+    if coverage:
+        worker_opts.extend(
+            opt
+            for opt in cfg.pytest.coverage_opts
+            if not opt.startswith("--cov-report")
+        )
+        # The reports are created from the combined data of all workers
+        worker_opts.append("--cov-report=")
+
+    def execute(index: int, bucket: list[str]) -> tuple[int, float]:
+        start = time.monotonic()
+        argsfile = worker_dir / f"worker-{index}.args"
+        writetext(argsfile, "\n".join(bucket))
+        log = worker_dir / f"worker-{index}.log"
+        with (
+            open(log, mode="w", encoding="utf-8") as fd,
+            span(f"pytest:worker-{index}", "sh"),
+        ):
+            returncode = run(  # pylint: disable=subprocess-run-check
+                [
+                    str(cfg.python.python),
+                    "-m",
+                    "pytest",
+                    *worker_opts,
+                    f"--junitxml={worker_dir / f'junit-{index}.xml'}",
+                    f"@{argsfile}",
+                ],
+                env={
+                    **os.environ,
+                    "COVERAGE_FILE": str(worker_dir / f".coverage.{index}"),
+                },
+                stdout=fd,
+                stderr=STDOUT,
+            ).returncode
+        return returncode, time.monotonic() - start
+
+    echo(
+        f"Running {len(tests)} tests using {len(buckets)} workers,"
+        f" logs in {worker_dir}"
+    )
+    with ThreadPoolExecutor(max_workers=len(buckets)) as executor:
+        futures = [
+            executor.submit(execute, index, bucket)
+            for index, bucket in enumerate(buckets)
+        ]
+        # The output of the workers is shown in order.
+        results = []
+        for index, future in enumerate(futures):
+            results.append(future.result())
+            echo(
+                f"Output of worker {index}:\n"
+                + readtext(worker_dir / f"worker-{index}.log"),
+                nl=False,
+            )
+
+    reports = [worker_dir / f"junit-{index}.xml" for index in range(len(buckets))]
+    data_files = [worker_dir / f".coverage.{index}" for index in range(len(buckets))]
+    if record_durations:
+        record_test_durations(cfg, "pytest", junit_durations(reports))
+    if partial is not None and not any(returncode for returncode, _ in results):
+        _record_impact(cfg, data_files, partial)
+    if with_test_report and cfg.pytest.test_report:
+        merge_junit(reports, Path(interpolate1(cfg.pytest.test_report)))
+    if coverage:
+        _combine_coverage(cfg.pytest.coverage_opts, data_files)
+
+    for index, (bucket, (returncode, duration)) in enumerate(zip(buckets, results)):
+        echo(
+            f"worker {index:<3}  {len(bucket):>6} tests  "
+            f"{'ok' if not returncode else 'FAILED':<6}  {duration:>8.1f}s"
+        )
+    if failed := sum(1 for returncode, _ in results if returncode):
+        die(f"{failed} of {len(buckets)} pytest workers failed.")
+
+
+def collect_tests(cfg: ConfigTree, opts: list[str], selection: list[str]) -> list[str]:
+    """Return the node ids of the tests pytest collects for `selection`."""
+    output = backtick(
+        cfg.python.python,
+        "-m",
+        "pytest",
+        "--collect-only",
+        "-q",
+        # More than one -q would only list the number of tests per file
+        *(opt for opt in opts if opt not in ("-q", "-qq", "--quiet")),
+        *selection,
+    )
+    tests = []
+    for line in output.splitlines():
+        if not line.strip():
+            break
+        if "::" in line:
+            tests.append(line.strip())
+    return tests
+
+
+def junit_key(nodeid: str) -> str:
+    """
+    Return the key of the test `nodeid` in the duration records. This is
+    "classname::name" as written into junit reports by pytest.
+    """
+    path, bracket, params = nodeid.partition("[")
+    names = path.split("::")
+    names[0] = names[0].replace("/", ".")
+    names[0] = names[0][:-3] if names[0].endswith(".py") else names[0]
+    return f"{'.'.join(names[:-1])}::{names[-1]}{bracket}{params}"
+
+
+def partition(
+    tests: list[str], durations: dict[str, float], buckets: int
+) -> list[list[str]]:
+    """
+    Distribute `tests` into `buckets` lists with about the same sum of
+    `durations` each, assigning the longest tests first. Tests without a
+    recorded duration are assumed to take the median of the known ones. If
+    no duration is known at all, the size of the test files divided by their
+    number of tests is used instead.
+
+    The result only depends on the arguments and the test files, so that
+    every CI node computes the same partition.
+    """
+    known = [durations[key] for key in map(junit_key, tests) if key in durations]
+    if known:
+        default = statistics.median(known)
+        weights = {test: durations.get(junit_key(test), default) for test in tests}
+    else:
+        weights = _size_weights(tests)
+    # sorted() is stable, thus tests with equal weights keep their order
+    weighted = sorted(
+        ((weights[test], test) for test in tests), key=lambda item: -item[0]
+    )
+    result: list[list[str]] = [[] for _ in range(buckets)]
+    loads = [(0.0, index) for index in range(buckets)]
+    for duration, test in weighted:
+        load, index = heapq.heappop(loads)
+        result[index].append(test)
+        heapq.heappush(loads, (load + duration, index))
+    return result
+
+
+def _size_weights(tests: list[str]) -> dict[str, float]:
+    """
+    Return the size of the file of each test divided by the number of tests
+    collected from this file.
+    """
+    files = [test.split("::")[0] for test in tests]
+    counts = Counter(files)
+    sizes = {
+        path: os.path.getsize(path) if os.path.isfile(path) else 1 for path in counts
+    }
+    return {
+        test: max(sizes[path], 1) / counts[path] for test, path in zip(tests, files)
+    }
+
+
+def shard_tests(cfg: ConfigTree, suite: str, shard: str, tests: list[str]) -> list[str]:
+    """
+    Return the tests of `shard`, given as INDEX/TOTAL, when distributing
+    `tests` into TOTAL parts by the durations recorded for `suite`.
+    """
+    match: Union[re.Match[str], None] = re.fullmatch(r"(\d+)/(\d+)", shard)
+    index, total = (int(match[1]), int(match[2])) if match is not None else (0, 0)
+    if not 1 <= index <= total:
+        die(f"Invalid shard '{shard}', expected INDEX/TOTAL with 1 <= INDEX <= TOTAL.")
+    selected = partition(tests, load_test_durations(cfg, suite), total)[index - 1]
+    echo(f"Running {len(selected)} of {len(tests)} tests in shard {index}/{total}.")
+    return selected
+
+
+def merge_junit(reports: list[Path], target: Path) -> None:
+    """Merge the test suites of the junit `reports` into `target`."""
+    root = ElementTree.Element("testsuites")
+    for report in reports:
+        if not exists(report):
+            continue
+        element = ElementTree.parse(report).getroot()  # nosec
+        root.extend([element] if element.tag == "testsuite" else list(element))
+    ElementTree.ElementTree(root).write(target, encoding="utf-8", xml_declaration=True)
+
+
+def _combine_coverage(coverage_opts: list[str], data_files: list[Path]) -> None:
+    """
+    Combine the coverage `data_files` and create the reports requested by
+    the --cov-report options within `coverage_opts`.
+    """
+    sh("coverage", "combine", *(path for path in data_files if exists(path)))
+    for opt in coverage_opts:
+        if not opt.startswith("--cov-report="):
+            continue
+        kind, _, destination = opt.split("=", 1)[1].partition(":")
+        if kind.startswith("term"):
+            sh("coverage", "report", *(["-m"] if kind == "term-missing" else []))
+        elif kind == "html":
+            sh("coverage", "html", *(["-d", destination] if destination else []))
+        elif kind in ("xml", "json", "lcov"):
+            sh("coverage", kind, *(["-o", destination] if destination else []))
+
+
+def _trigger_hashes(cfg: ConfigTree) -> dict[str, str]:
+    """
+    Return the hashes of the files within the project matching
+    {pytest.impact.triggers}, which affect all tests when changed.
+    """
+    root = str(cfg.spin.project_root)
+    hashes = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if not name.startswith(".") and name not in ("__pycache__", "node_modules")
+        ]
+        for name in filenames:
+            if any(fnmatch(name, pattern) for pattern in cfg.pytest.impact.triggers):
+                path = os.path.join(dirpath, name)
+                hashes[os.path.relpath(path, root).replace(os.sep, "/")] = _file_hash(
+                    path
+                )
+    return hashes
+
+
+def _load_impact(cfg: ConfigTree) -> dict:
+    """Return the impact map stored in {pytest.impact.path}."""
+    if not exists(cfg.pytest.impact.path):
+        return {}
+    try:
+        return json.loads(readtext(cfg.pytest.impact.path))  # type: ignore[no-any-return]
+    except ValueError:
+        return {}
+
+
+def affected_tests(cfg: ConfigTree, tests: list[str]) -> Union[list[str], None]:
+    """
+    Return the tests among `tests` which touch files that changed since
+    they were recorded in the impact map, as well as the tests not recorded
+    yet. Returns None, if there is no impact map or a file matching
+    {pytest.impact.triggers} changed.
+    """
+    impact = _load_impact(cfg)
+    if not impact or impact["triggers"] != _trigger_hashes(cfg):
+        return None
+    root = cfg.spin.project_root
+    changed = {
+        path
+        for path, digest in impact["files"].items()
+        if not exists(root / path) or _file_hash(root / path) != digest
+    }
+    return [
+        test
+        for test in tests
+        if test not in impact["tests"] or changed.intersection(impact["tests"][test])
+    ]
+
+
+def _record_impact(cfg: ConfigTree, data_files: list[Path], partial: bool) -> None:
+    """
+    Update the impact map with the files within the project touched by
+    each test, as recorded in the coverage `data_files` with test contexts.
+    Unless `partial` is set, the tests not run are removed from the map.
+    """
+    root = str(cfg.spin.project_root)
+    touched: dict[str, set[str]] = {}
+    for data_file in data_files:
+        if not exists(data_file):
+            continue
+        with closing(sqlite3.connect(data_file)) as db:
+            for path, context in db.execute(
+                "SELECT file.path, context.context FROM file"
+                " JOIN (SELECT file_id, context_id FROM line_bits"
+                " UNION SELECT file_id, context_id FROM arc) AS measured"
+                " ON file.id = measured.file_id"
+                " JOIN context ON context.id = measured.context_id"
+            ):
+                # Contexts look like "tests/test_a.py::test_b|run"
+                test = context.rpartition("|")[0]
+                relpath = os.path.relpath(path, root)
+                if test and not relpath.startswith(".."):
+                    touched.setdefault(test, set()).add(relpath.replace(os.sep, "/"))
+
+    tests = _load_impact(cfg).get("tests", {}) if partial else {}
+    tests.update({test: sorted(paths) for test, paths in touched.items()})
+    files = _load_impact(cfg).get("files", {}) if partial else {}
+    for path in {path for paths in touched.values() for path in paths}:
+        if exists(Path(root) / path):
+            files[path] = _file_hash(Path(root) / path)
+    referenced = {path for paths in tests.values() for path in paths}
+    writetext(
+        cfg.pytest.impact.path,
+        json.dumps(
+            {
+                "triggers": _trigger_hashes(cfg),
+                "files": {
+                    path: digest for path, digest in files.items() if path in referenced
+                },
+                "tests": tests,
+            },
+            indent=0,
+            sort_keys=True,
+        ),
+    )
+
+
+def _snapshot(cfg: ConfigTree) -> dict[str, tuple[int, int]]:
+    """
+    Return the modification time and size of the Python files and the files
+    matching {pytest.impact.triggers} within the project.
+    """
+    root = str(cfg.spin.project_root)
+    patterns = ["*.py", *cfg.pytest.impact.triggers]
+    snapshot = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if not name.startswith(".") and name not in ("__pycache__", "node_modules")
+        ]
+        for name in filenames:
+            if any(fnmatch(name, pattern) for pattern in patterns):
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[os.path.relpath(path, root)] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def watch_changes(
+    cfg: ConfigTree, snapshot: dict[str, tuple[int, int]]
+) -> Generator[set[str], None, None]:
+    """
+    Return a generator yielding the files changed since `snapshot`
+    respectively the previous iteration, as soon as no further changes
+    happened for {pytest.watch.debounce} seconds.
+
+    Changes are noticed via watchdog if installed, otherwise the project is
+    checked for changes every {pytest.watch.interval} seconds. The observer
+    is started right away, so that changes happening before the first
+    iteration, e.g. while the tests run for the first time, are noticed.
+    """
+    root = str(cfg.spin.project_root)
+    changed = threading.Event()
+    observer = None
+    try:
+        # pylint: disable=import-outside-toplevel
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        info("Install csspin-python[watch] to watch without polling.")
     else:
-        sh(*cmd, *opts, *args, *cfg.pytest.tests)
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event: object) -> None:
+                changed.set()
+
+        observer = Observer()
+        # Don't watch the venv and other hidden directories
+        observer.schedule(Handler(), root, recursive=False)
+        for entry in os.scandir(root):
+            if entry.is_dir() and not entry.name.startswith("."):
+                observer.schedule(Handler(), entry.path, recursive=True)
+        observer.start()
+    return _watch(cfg, snapshot, changed, observer)
+
+
+def _watch(
+    cfg: ConfigTree,
+    snapshot: dict[str, tuple[int, int]],
+    changed: threading.Event,
+    observer: Any,
+) -> Generator[set[str], None, None]:
+    """
+    Yield the files changed since `snapshot`, waiting for `changed` to be
+    set by the watchdog `observer` or polling if there is none.
+    """
+    try:
+        while True:
+            # Changes happening while taking the snapshot set `changed` again
+            changed.clear()
+            if (current := _snapshot(cfg)) == snapshot:
+                changed.wait(None if observer else float(cfg.pytest.watch.interval))
+                continue
+            # Wait for the burst of changes to end, e.g. when switching branches
+            while True:
+                time.sleep(float(cfg.pytest.watch.debounce))
+                if (settled := _snapshot(cfg)) == current:
+                    break
+                current = settled
+            yield {
+                path
+                for path in current.keys() | snapshot.keys()
+                if current.get(path) != snapshot.get(path)
+            }
+            snapshot = current
+    finally:
+        if observer:
+            observer.stop()
+            observer.join()
@@ -51,6 +51,21 @@ Tasks
 .. click:: csspin_python:python:wheel
    :prog: spin python:wheel
 
+.. click:: csspin_python:python:pack-interpreter
+   :prog: spin python:pack-interpreter
+
+.. click:: csspin_python:python:lock
+   :prog: spin python:lock
+
+.. click:: csspin_python:python:wheelhouse
+   :prog: spin python:wheelhouse
+
+.. click:: csspin_python:python:plan
+   :prog: spin python:plan
+
+.. click:: csspin_python:test:durations
+   :prog: spin test:durations
+
 .. click:: csspin_python:env
    :prog: spin env
 
@@ -67,16 +82,30 @@ point to the base installation.
 """
 
 import abc
+import atexit
 import configparser
 import hashlib
+import importlib.util
+import json
 import logging
 import os
+import platform
 import re
 import shutil
+import site
+import sqlite3
+import statistics
 import sys
-from subprocess import check_output
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from subprocess import DEVNULL, STDOUT, CalledProcessError, Popen, check_output, run
 from textwrap import dedent, indent
-from typing import Iterable, Type, Union
+from typing import Callable, Generator, Iterable, Type, Union
+from xml.etree import ElementTree  # nosec: blacklist
 
 try:
     from typing import Self  # type: ignore[attr-defined]
@@ -101,6 +130,7 @@ from csspin import (
     echo,
     error,
     exists,
+    extract,
     get_requires,
     info,
     interpolate1,
@@ -108,6 +138,8 @@ from csspin import (
     mkdir,
     namespaces,
     normpath,
+    option,
+    parse_version,
     readtext,
     rmtree,
     setenv,
@@ -120,11 +152,42 @@ from csspin.tree import ConfigTree
 
 defaults = config(
     build_wheels=["{spin.project_root}"],
+    wheel_jobs=1,
+    wheel_cache="{spin.spin_dir}/wheel_cache",
+    build_envs=config(
+        enabled=False,
+        path="{spin.data}/build_envs",
+    ),
+    wheel_logs="{spin.spin_dir}/wheel_logs",
     pyenv=config(
         url="https://github.com/pyenv/pyenv.git",
         path="{spin.data}/pyenv",
         cache="{spin.data}/pyenv_cache",
         python_build="{python.pyenv.path}/plugins/python-build/bin/python-build",
+        revision="",
+        shallow=False,
+        offline=False,
+        profile="",
+        profiles=config(
+            fast=config(
+                configure_opts=["--disable-test-modules"],
+                make_opts=[f"-j{os.cpu_count() or 1}"],
+            ),
+            optimized=config(
+                configure_opts=["--enable-optimizations", "--with-lto"],
+                make_opts=[f"-j{os.cpu_count() or 1}"],
+            ),
+            jit=config(
+                configure_opts=["--enable-experimental-jit"],
+                make_opts=[f"-j{os.cpu_count() or 1}"],
+                min_version="3.13",
+            ),
+            slim=config(
+                configure_opts=["--disable-test-modules"],
+                make_opts=[f"-j{os.cpu_count() or 1}"],
+                ldflags="-s",
+            ),
+        ),
     ),
     user_pyenv=False,
     nuget=config(
@@ -146,6 +209,9 @@ defaults = config(
     ),
     venv="{spin.spin_dir}/venv",
     memo="{python.venv}/spininfo.memo",
+    venv_info="{python.venv}/spininfo.json",
+    activation="{python.venv}/spinactivate.json",
+    digests="{python.venv}/spindigests.json",
     bindir="{python.venv}/bin" if sys.platform != "win32" else "{python.venv}",
     scriptdir=(
         "{python.venv}/bin" if sys.platform != "win32" else "{python.venv}/Scripts"
@@ -153,6 +219,34 @@ defaults = config(
     python="{python.scriptdir}/python{platform.exe}",
     provisioner=None,
     provisioner_memo="{spin.spin_dir}/python_provisioner.memo",
+    templates=config(
+        enabled=False,
+        path="{spin.data}/venv_templates",
+    ),
+    artifacts=config(
+        path="{spin.data}/python_artifacts",
+        pack=False,
+    ),
+    lock=config(
+        enabled=False,
+        path="{spin.project_root}/requirements.lock",
+    ),
+    wheelhouse=None,
+    trace=None,
+    history="{spin.spin_dir}/provision_history.json",
+    test_durations=config(
+        path="{spin.spin_dir}/test_durations.sqlite",
+        window=10,
+        runs=100,
+        threshold=0,
+        min_duration=0.5,
+    ),
+    discovery="{spin.data}/interpreters.json",
+    prefetch=config(
+        enabled=False,
+        path="{spin.data}/prefetched_wheels",
+        jobs=4,
+    ),
     aws_auth=config(
         enabled=False,
         memo="{spin.spin_dir}/aws_auth.memo",
@@ -171,42 +265,470 @@ defaults = config(
 @task()
 def python(args: Iterable[object]) -> None:
     """Run the Python interpreter used for this projects."""
-    sh("python", *args)
+    with span("python", "sh"):
+        sh("python", *args)
 
 
 @task("python:wheel", when="package")
 def wheel(
     cfg: ConfigTree,
+    jobs: option(  # type: ignore[valid-type]
+        "-j",  # noqa: F821
+        "--jobs",  # noqa: F821
+        type=int,
+        default=None,
+        help="Number of wheels to build concurrently.",  # noqa: F722
+    ),
+    force: option(  # type: ignore[valid-type]
+        "--force",  # noqa: F821
+        is_flag=True,
+        help="Rebuild wheels whose sources didn't change.",  # noqa: F722
+    ),
     paths: argument(type=str, nargs=-1, required=False),  # type: ignore[valid-type]
 ) -> None:
     """Build a wheel of the current project and any additional wheels."""
     setenv(PIP_INDEX_URL=cfg.python.index_url)
     search_paths = paths or cfg.python.build_wheels
-    for build_path in {Path(path).absolute() for path in search_paths}:
+    targets = list(dict.fromkeys(Path(path).absolute() for path in search_paths))
+    jobs = min(int(cfg.python.wheel_jobs if jobs is None else jobs), len(targets))
+    if jobs <= 1:
+        for build_path in targets:
+            _build_target(cfg, build_path, force=force)
+        return
+
+    logdir = mkdir(cfg.python.wheel_logs)
+    logs = [
+        logdir / f"{index:02d}-{target.name}.log"
+        for index, target in enumerate(targets)
+    ]
+    echo(f"Building {len(targets)} wheels using {jobs} jobs, logs in {logdir}")
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_build_target, cfg, target, log, force)
+            for target, log in zip(targets, logs)
+        ]
+        # The output of the builds is shown in order of the targets.
+        results = []
+        for target, log, future in zip(targets, logs, futures):
+            results.append(future.result())
+            echo(f"Output of building {target}:\n{readtext(log)}", nl=False)
+
+    width = max(len(str(target)) for target in targets)
+    for target, (success, duration) in zip(targets, results):
+        echo(
+            f"{str(target):<{width}}  {'ok' if success else 'FAILED':<6}"
+            f"  {duration:>8.1f}s"
+        )
+    if failed := [
+        str(target) for target, (success, _) in zip(targets, results) if not success
+    ]:
+        die(f"Failed to build {', '.join(failed)}.")
+
+
+def _build_target(
+    cfg: ConfigTree,
+    build_path: Path,
+    log: Union[Path, None] = None,
+    force: bool = False,
+) -> tuple[bool, float]:
+    """
+    Build the wheel of the project in `build_path` and copy it to
+    {spin.project_root}/dist, unless the sources and the build configuration
+    didn't change since the last build. In this case, the previous wheel is
+    reused.
+
+    Returns whether the build succeeded and its duration in seconds.
+    """
+    start = time.monotonic()
+    staging = (
+        Path(interpolate1(cfg.python.wheel_cache))
+        / hashlib.sha256(str(build_path).encode("utf-8")).hexdigest()[:16]
+    )
+    fingerprint = _wheel_fingerprint(cfg, build_path)
+    wheels = staging.glob("wheels/*.whl") if exists(staging / "wheels") else []
+    if (
+        not force
+        and wheels
+        and exists(staging / "fingerprint")
+        and readtext(staging / "fingerprint") == fingerprint
+    ):
+        message = f"{build_path} didn't change, reusing {len(wheels)} wheel(s)"
+        if log is None:
+            echo(message)
+        else:
+            writetext(log, f"{message}\n")
+    else:
+        for directory in ("wheels", "build", "fingerprint"):
+            rmtree(staging / directory)
+        success, _ = _build_wheel(cfg, build_path, staging, log)
+        if not success:
+            return False, time.monotonic() - start
+        writetext(staging / "fingerprint", fingerprint)
+        wheels = staging.glob("wheels/*.whl")
+
+    dist = mkdir(cfg.spin.project_root / "dist")
+    for wheel_file in wheels:
+        shutil.copy2(wheel_file, dist)
+    return True, time.monotonic() - start
+
+
+def _wheel_fingerprint(cfg: ConfigTree, build_path: Path) -> str:
+    """
+    Return a fingerprint of the sources of the project in `build_path`, the
+    version git derives for it and the configuration used to build it. The
+    sources are the files tracked or not ignored by git, or all files if
+    `build_path` isn't part of a git repository.
+    """
+    try:
+        files = check_output(
+            ["git", "ls-files", "-z", "-co", "--exclude-standard"],
+            cwd=build_path,
+            stderr=DEVNULL,
+            encoding="utf-8",
+        ).split("\0")
+    except (OSError, CalledProcessError):
+        excluded = {".git", ".spin", "build", "dist", "__pycache__"}
+        files = []
+        for root, dirs, names in os.walk(build_path):
+            dirs[:] = [
+                name
+                for name in dirs
+                if name not in excluded and not name.endswith(".egg-info")
+            ]
+            files.extend(
+                os.path.relpath(os.path.join(root, name), build_path) for name in names
+            )
+    sha = hashlib.sha256()  # nosec: hashlib
+    sha.update(
+        "\n".join(
+            (
+                str(cfg.verbosity > Verbosity.NORMAL),
+                interpolate1(cfg.python.index_url),
+                str(get_venv_info(cfg)["version"]),
+                str(bool(cfg.python.build_envs.enabled)),
+                str(interpolate1(cfg.python.build_envs.path)),
+                _git_describe(build_path),
+            )
+        ).encode("utf-8")
+    )
+    for file in sorted(filter(None, files)):
+        # Files deleted but still tracked are listed by git as well
+        if os.path.isfile(path := os.path.join(build_path, file)):
+            sha.update(f"\n{file}:{_file_hash(path)}".encode("utf-8"))
+    return sha.hexdigest()
+
+
+def _git_describe(build_path: Path) -> str:
+    """
+    Return the description of the commit checked out at `build_path`, which
+    tools like setuptools-scm derive the version of the project from, or an
+    empty string if `build_path` isn't part of a git repository.
+    """
+    try:
+        return check_output(
+            ["git", "describe", "--tags", "--dirty", "--always"],
+            cwd=build_path,
+            stderr=DEVNULL,
+            encoding="utf-8",
+        ).strip()
+    except (OSError, CalledProcessError):
+        return ""
+
+
+def _build_wheel(
+    cfg: ConfigTree,
+    build_path: Path,
+    staging: Path,
+    log: Union[Path, None] = None,
+) -> tuple[bool, float]:
+    """
+    Build the wheel of the project in `build_path` into `staging`/wheels,
+    falling back to setup.py if building it the PEP 517 way fails. If `log`
+    is passed, the output of the build is written into this file instead of
+    the console and failures don't abort spin.
+
+    Returns whether the build succeeded and its duration in seconds.
+    """
+    start = time.monotonic()
+    dist = staging / "wheels"
+    if log is not None:
+        writetext(log, "")
+
+    def execute(cmd: list, cwd: Union[Path, None], name: str) -> bool:
+        if log is None:
+            try:
+                with cd(cwd or os.getcwd()), span(name, "sh"):
+                    sh(*cmd)
+                return True
+            except Abort:
+                return False
+        with open(log, mode="a", encoding="utf-8") as fd, span(name, "sh"):
+            return not run(  # pylint: disable=subprocess-run-check
+                [str(arg) for arg in cmd if arg is not None],
+                cwd=cwd,
+                stdout=fd,
+                stderr=STDOUT,
+            ).returncode
+
+    def message(text: str) -> None:
+        if log is None:
+            echo(text)
+        else:
+            with open(log, mode="a", encoding="utf-8") as fd:
+                fd.write(f"{text}\n")
+
+    build = ["python", "-m", "build", "-w", build_path, "-o", dist]
+    if cfg.python.build_envs.enabled and (
+        build_env := _build_env(cfg, build_path, execute)
+    ):
+        message("Building PEP 517-like wheel in a shared build environment")
+        if execute(
+            [build_env, "-m", "build", "--no-isolation", *build[3:]],
+            None,
+            f"build:{build_path.name}",
+        ):
+            return True, time.monotonic() - start
+        # Builds failing without isolation may still succeed in an isolated
+        # build environment.
+
+    message("Building PEP 517-like wheel")
+    if execute(build, None, f"build:{build_path.name}"):
+        return True, time.monotonic() - start
+
+    message("Building does not seem to work, use legacy setup.py style")
+    if execute(
+        [
+            "python",
+            "setup.py",
+            None if cfg.verbosity > Verbosity.NORMAL else "-v" "build",
+            "-b",
+            staging / "build",
+            "bdist_wheel",
+            "-d",
+            dist,
+        ],
+        build_path,
+        f"setup.py:{build_path.name}",
+    ):
+        return True, time.monotonic() - start
+    if log is None:
+        die(f"Failed to build {build_path}.")
+    return False, time.monotonic() - start
+
+
+# Serializes creating the build environments of concurrent builds within
+# this process
+BUILD_ENV_LOCK = threading.Lock()
+
+
+def _build_env(
+    cfg: ConfigTree,
+    build_path: Path,
+    execute: Callable[[list, Union[Path, None], str], bool],
+) -> Union[Path, None]:
+    """
+    Return the interpreter of the cached build environment providing the
+    build requirements of the project in `build_path`, creating it if
+    necessary. Build environments are shared by all projects with the same
+    build requirements and interpreter. Returns None if the environment
+    can't be created.
+    """
+    requires = sorted(_build_requirements(build_path))
+    interpreter = get_venv_info(cfg)["version"]
+    fingerprint = hashlib.sha256(  # nosec: hashlib
+        "\n".join((interpreter, *requires)).encode("utf-8")
+    ).hexdigest()[:16]
+    build_env = Path(interpolate1(cfg.python.build_envs.path)) / fingerprint
+    executable = "Scripts/python.exe" if sys.platform == "win32" else "bin/python"
+    with BUILD_ENV_LOCK:
+        if exists(build_env / "spin_build_env"):
+            return build_env / executable
+        # Other spin processes may use or create the same environment, thus it
+        # is created in a sibling directory and renamed once it is complete.
+        # Only `python -m` is used, which doesn't depend on the location.
+        staging = Path(f"{build_env}.{os.getpid()}")
+        rmtree(staging)
+        if not (
+            execute(
+                [cfg.python.python, "-m", "venv", staging],
+                None,
+                "create_build_env",
+            )
+            and execute(
+                [
+                    staging / executable,
+                    "-mpip",
+                    "-q",
+                    "--disable-pip-version-check",
+                    "install",
+                    *(_index_options(cfg) or ["--index-url", cfg.python.index_url]),
+                    "build",
+                    *requires,
+                ],
+                None,
+                "install_build_env",
+            )
+        ):
+            rmtree(staging)
+            return None
+        # Marks the environment as complete
+        writetext(staging / "spin_build_env", "\n".join(requires))
+        if exists(build_env) and not exists(build_env / "spin_build_env"):
+            # Left over by an interrupted spin of an earlier version
+            rmtree(build_env)
         try:
-            echo("Building PEP 517-like wheel")
-            sh(
-                "python",
-                "-m",
-                "build",
-                "-w",
-                build_path,
-                "-o",
-                "{spin.project_root}/dist",
+            staging.rename(build_env)
+        except OSError:
+            # Another process created the same environment in the meantime.
+            rmtree(staging)
+    return build_env / executable
+
+
+@task("python:pack-interpreter")
+def pack_interpreter(cfg: ConfigTree) -> None:
+    """Archive the Python interpreter for reuse by other machines."""
+    if cfg.python.use or cfg.python.user_pyenv or sys.platform == "win32":
+        die("Only interpreters built from source by spin can be archived.")
+    _pack_interpreter(cfg)
+
+
+@task("python:lock")
+def lock(cfg: ConfigTree) -> None:
+    """Resolve the requirements into a lock file with pins and hashes."""
+    lockfile = interpolate1(cfg.python.lock.path)
+    echo(f"Resolving the requirements into {lockfile}")
+    provisioner = cfg.python.provisioner or SimpleProvisioner(cfg)
+    lines = provisioner.lock(
+        cfg,
+        [
+            _requirement_for_lock(req, cfg.spin.project_root)
+            for req in _get_requirements(cfg)
+        ],
+    )
+    writetext(
+        lockfile,
+        "\n".join(
+            (
+                "# This file has been generated by 'spin python:lock' for Python"
+                f" {cfg.python.version} on {sys.platform}.",
+                f"{LOCK_INPUTS}{_lock_inputs(cfg)}",
+                *lines,
+                "",
             )
-        except Abort:
-            echo("Building does not seem to work, use legacy setup.py style")
-            with cd(build_path):
-                sh(
-                    "python",
-                    "setup.py",
-                    None if cfg.verbosity > Verbosity.NORMAL else "-v" "build",
-                    "-b",
-                    "{spin.project_root}/build",
-                    "bdist_wheel",
-                    "-d",
-                    "{spin.project_root}/dist",
-                )
+        ),
+    )
+
+
+@task("python:wheelhouse")
+def wheelhouse(
+    cfg: ConfigTree,
+    path: argument(type=str, required=False),  # type: ignore[valid-type]
+) -> None:
+    """
+    Collect the wheels of all requirements in a directory, to provision
+    without package index.
+    """
+    if not (path := path or cfg.python.wheelhouse):
+        die("Please pass a directory or set python.wheelhouse.")
+    locked = _use_lock(cfg)
+    requirements = ["pip"]
+    for req in _get_requirements(cfg):
+        if _is_local_requirement(req):
+            # Local packages are built within the venv during installation, so
+            # their build requirements are needed. Their dependencies are only
+            # known by building them, unless they are pinned in the lock file.
+            target, bracket, extras = str(
+                _local_requirement_path(req, cfg.spin.project_root)
+            ).partition("[")
+            directory = Path(os.path.abspath(target))
+            requirements.extend(_build_requirements(directory))
+            if not locked:
+                requirements.append(f"{directory}{bracket}{extras}")
+        elif not locked:
+            requirements.append(_requirement_for_lock(req, cfg.spin.project_root))
+    # The pins of the lock file come with hashes, which make pip require
+    # hashes for all requirements of the same call.
+    groups = [[f"--requirement={cfg.python.lock.path}"]] if locked else []
+    for group in (*groups, requirements):
+        sh(
+            "python",
+            "-mpip",
+            None if cfg.verbosity > Verbosity.NORMAL else "-q",
+            "--disable-pip-version-check",
+            "wheel",
+            f"--index-url={cfg.python.index_url}",
+            f"--wheel-dir={path}",
+            *[
+                f"--constraint={cfg.spin.project_root / constraint}"
+                for constraint in cfg.python.constraints
+            ],
+            *SimpleProvisioner._split(group),
+        )
+
+
+@task("python:plan", noenv=True)
+def plan(cfg: ConfigTree) -> None:
+    """
+    Report what 'spin provision' would do, without doing it.
+
+    The historic durations are the medians of the last provisions.
+    """
+    history = _load_history(interpolate1(cfg.python.history))
+    rows = _provision_plan(cfg)
+    width = max(len(phase) for phase, _ in rows)
+    for phase, action in rows:
+        durations = sorted(history.get(phase, []))
+        estimate = f" (~{durations[len(durations) // 2]:.1f}s)" if durations else ""
+        echo(f"{phase:<{width}}  {action}{estimate}")
+
+
+@task("test:durations", noenv=True)
+def durations_report(
+    cfg: ConfigTree,
+    suite: option(  # type: ignore[valid-type]
+        "--suite",  # noqa: F821
+        default=None,
+        help="Only report the tests of this suite, e.g. pytest or behave.",  # noqa: F722
+    ),
+    limit: option(  # type: ignore[valid-type]
+        "-n",  # noqa: F821
+        "--limit",  # noqa: F821
+        type=int,
+        default=20,
+        help="Number of tests to report per suite.",  # noqa: F722
+    ),
+) -> None:
+    """
+    Report the slowest tests of the last runs and the trend of their
+    durations.
+
+    The trend compares the last duration of a test to the median of its
+    previous durations.
+    """
+    if not exists(cfg.python.test_durations.path):
+        die("No test durations recorded yet, run the tests with --with-test-report.")
+    window = int(cfg.python.test_durations.window)
+    with closing(_test_durations_db(cfg)) as db:
+        suites = [suite] if suite else [row[0] for row in db.execute(SUITES_QUERY)]
+        for name in suites:
+            history: dict[str, list[float]] = {}
+            for test, duration in db.execute(DURATIONS_QUERY, (name, window + 1)):
+                history.setdefault(test, []).append(duration)
+            if not history:
+                continue
+            echo(f"Slowest tests of {name}:")
+            width = min(max(len(test) for test in history), 100)
+            for test, durations in sorted(
+                history.items(), key=lambda item: -item[1][0]
+            )[:limit]:
+                if len(durations) > 1:
+                    median = statistics.median(durations[1:])
+                    trend = (
+                        f"{(durations[0] / median - 1) * 100 if median else 0:+.0f}%"
+                    )
+                else:
+                    trend = "new"
+                echo(f"{test:<{width}}  {durations[0]:>8.2f}s  {trend:>6}")
 
 
 @task()
@@ -229,31 +751,193 @@ def pyenv_install(cfg: ConfigTree) -> None:
     with namespaces(cfg.python):
         if cfg.python.user_pyenv:
             info("Using your existing pyenv installation ...")
-            sh("pyenv", "install", "--skip-existing", {cfg.python.version})
+            with span("pyenv install", "sh"):
+                sh("pyenv", "install", "--skip-existing", {cfg.python.version})
             cfg.python.interpreter = backtick("pyenv which python --nosystem").strip()
         else:
+            with span("restore_interpreter"):
+                if _restore_interpreter(cfg):
+                    return
             info("Installing Python {version} to {inst_dir}")
             # For Linux/macOS using the 'python-build' plugin from
             # pyenv is by far the most robust way to install a
             # version of Python.
-            if not exists("{pyenv.path}"):
-                sh("git", "clone", cfg.python.pyenv.url, cfg.python.pyenv.path)
-            else:
-                with cd(cfg.python.pyenv.path):
-                    sh("git", "pull")
+            with span("checkout_pyenv"):
+                _checkout_pyenv(cfg)
             # we should set
             setenv(PYTHON_BUILD_CACHE_PATH=mkdir(cfg.python.pyenv.cache))
-            setenv(PYTHON_CFLAGS="-DOPENSSL_NO_COMP")
             try:
-                sh(
-                    cfg.python.pyenv.python_build,
-                    cfg.python.version,
-                    cfg.python.inst_dir,
-                )
+                with span("python-build", "sh"):
+                    sh(
+                        cfg.python.pyenv.python_build,
+                        cfg.python.version,
+                        cfg.python.inst_dir,
+                        env=_python_build_env(cfg),
+                    )
             except Abort:
                 error("Failed to build the Python interpreter - removing it")
                 rmtree(cfg.python.inst_dir)
                 raise
+            if cfg.python.artifacts.pack:
+                with span("pack_interpreter"):
+                    _pack_interpreter(cfg)
+
+
+def _checkout_pyenv(cfg: ConfigTree) -> None:
+    """
+    Clone or update the pyenv sources at {python.pyenv.path}, optionally
+    pinned to {python.pyenv.revision}.
+    """
+    pyenv = cfg.python.pyenv
+    if pyenv.offline:
+        if not exists(pyenv.path):
+            die(f"{pyenv.path} does not exist, cannot provision Python offline.")
+        info(f"Using the existing pyenv sources at {pyenv.path}")
+        return
+
+    cloned = not exists(pyenv.path)
+    if cloned:
+        sh(
+            "git",
+            "clone",
+            "--depth=1" if pyenv.shallow else None,
+            "--no-checkout" if pyenv.revision else None,
+            pyenv.url,
+            pyenv.path,
+        )
+    elif not pyenv.revision:
+        with cd(pyenv.path):
+            sh("git", "pull")
+    if not pyenv.revision:
+        return
+
+    with cd(pyenv.path):
+        if commit := _git_commit(pyenv.revision):
+            # A fresh clone has no work tree yet, even if HEAD is the pin.
+            if not cloned and commit == _git_commit("HEAD"):
+                return
+        else:
+            sh(
+                "git",
+                "fetch",
+                "--depth=1" if pyenv.shallow else None,
+                "origin",
+                pyenv.revision,
+            )
+            commit = _git_commit("FETCH_HEAD")
+        sh("git", "-c", "advice.detachedHead=false", "checkout", "--detach", commit)
+
+
+def _git_commit(revision: str) -> str:
+    """
+    Return the commit of `revision` in the current git repository or an empty
+    string if it is unknown.
+    """
+    try:
+        return (
+            check_output(
+                ["git", "rev-parse", "--verify", "--quiet", f"{revision}^0"],
+                stderr=DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except CalledProcessError:
+        return ""
+
+
+def _python_build_env(cfg: ConfigTree) -> dict[str, str]:
+    """
+    Return the environment variables used to configure python-build,
+    including those of the build profile {python.pyenv.profile}.
+    """
+    env = {"PYTHON_CFLAGS": "-DOPENSSL_NO_COMP"}
+    if not (profile := cfg.python.pyenv.profile):
+        return env
+
+    settings = cfg.python.pyenv.profiles[profile]
+    if (min_version := settings.get("min_version")) and parse_version(
+        cfg.python.version
+    ) < parse_version(min_version):
+        die(
+            f"The build profile '{profile}' requires at least Python" f" {min_version}."
+        )
+    if cflags := settings.get("cflags"):
+        env["PYTHON_CFLAGS"] += f" {cflags}"
+    if ldflags := settings.get("ldflags"):
+        env["LDFLAGS"] = ldflags
+    if configure_opts := settings.get("configure_opts"):
+        env["PYTHON_CONFIGURE_OPTS"] = " ".join(configure_opts)
+    if make_opts := settings.get("make_opts"):
+        env["MAKE_OPTS"] = " ".join(make_opts)
+    return env
+
+
+def _interpreter_artifact(cfg: ConfigTree) -> Path:
+    """
+    Return the path of the archive containing the interpreter built for the
+    current Python version, platform, libc, installation directory and build
+    flags.
+    """
+    libc = "".join(platform.libc_ver()) or platform.mac_ver()[0] or "unknown"
+    flags = "\n".join(
+        [
+            # Interpreters are not relocatable, thus the installation
+            # directory is part of the build flags.
+            str(cfg.python.inst_dir),
+            *(
+                f"{key}={value}"
+                for key, value in _python_build_env(cfg).items()
+                # The options for make don't affect the interpreter built
+                if key != "MAKE_OPTS"
+            ),
+        ]
+    )
+    flags_hash = hashlib.sha256(flags.encode("utf-8")).hexdigest()[:16]
+    return Path(cfg.python.artifacts.path) / (
+        f"cpython-{cfg.python.version}-{sys.platform}-{platform.machine()}"
+        f"-{libc}-{flags_hash}.tar.gz"
+    )
+
+
+def _pack_interpreter(cfg: ConfigTree) -> None:
+    """Archive the interpreter at {python.inst_dir} for reuse."""
+    artifact = _interpreter_artifact(cfg)
+    info(f"Archiving {cfg.python.inst_dir} to {artifact}")
+    mkdir(cfg.python.artifacts.path)
+    staging = f"{artifact}.{os.getpid()}"
+    with tarfile.open(staging, mode="w:gz") as archive:
+        archive.add(interpolate1(cfg.python.inst_dir), arcname=".")
+    os.replace(staging, artifact)
+
+
+def _restore_interpreter(cfg: ConfigTree) -> bool:
+    """
+    Restore the interpreter at {python.inst_dir} from a previously archived
+    build and return whether this succeeded.
+    """
+    if not exists(artifact := _interpreter_artifact(cfg)):
+        return False
+    info(f"Restoring Python {cfg.python.version} from {artifact}")
+    # Extract into a sibling directory first, so that an interrupted or failed
+    # extraction never leaves a partial interpreter at {python.inst_dir}.
+    inst_dir = interpolate1(cfg.python.inst_dir)
+    staging = f"{inst_dir}.{os.getpid()}"
+    try:
+        extract(artifact, staging)
+        rmtree(inst_dir)
+        os.replace(staging, inst_dir)
+    except (Abort, EOFError, tarfile.TarError) as ex:
+        # `extract` dies for files that aren't archives at all
+        warn(f"Removing the corrupt archive {artifact}: {ex or 'no archive'}")
+        rmtree(staging)
+        rmtree(artifact)
+        return False
+    except OSError as ex:
+        warn(f"Failed to restore the Python interpreter: {ex}")
+        rmtree(staging)
+        return False
+    return True
 
 
 def nuget_install(cfg: ConfigTree) -> None:
@@ -295,12 +979,19 @@ def provision(cfg: ConfigTree) -> None:
         if not memo.check(cfg.python.provisioner):
             memo.add(cfg.python.provisioner)
 
-    if not shutil.which(cfg.python.interpreter):
-        cfg.python.provisioner.provision_python(cfg)
+    atexit.register(_record_history, interpolate1(cfg.python.history))
+    _start_prefetch(cfg)
+    try:
+        with span("provision_python"):
+            if not which_interpreter(cfg):
+                cfg.python.provisioner.provision_python(cfg)
 
-    venv_provision(cfg)
+        with span("venv_provision"):
+            venv_provision(cfg)
+    finally:
+        _stop_prefetch()
 
-    cfg.python.site_packages = get_site_packages(interpreter=cfg.python.python)
+    cfg.python.site_packages = Path(get_venv_info(cfg, refresh=True)["purelib"])
 
 
 def configure(cfg: ConfigTree) -> None:
@@ -318,25 +1009,417 @@ def configure(cfg: ConfigTree) -> None:
 
     elif cfg.python.user_pyenv:
         setenv(PYENV_VERSION="{python.version}")
-        try:
-            cfg.python.interpreter = backtick(
+        if cfg.python.pyenv.profile:
+            warn("python.pyenv.profile will be ignored when using python.user_pyenv.")
+
+        def pyenv_which() -> str:
+            return backtick(  # type: ignore[no-any-return]
                 "pyenv which python --nosystem",
                 check=False,
                 silent=not cfg.verbosity > Verbosity.NORMAL,
             ).strip()
+
+        try:
+            cfg.python.interpreter = discover_interpreter(
+                cfg, f"pyenv:{cfg.python.version}", pyenv_which
+            )
         except Exception:  # pylint: disable=broad-exception-caught # nosec
             warn(
                 "The desired interpreter is not available within the"
                 " user's pyenv installation."
             )
 
+    elif profile := interpolate1(cfg.python.pyenv.profile):
+        if profile not in cfg.python.pyenv.profiles:
+            die(
+                f"Unknown build profile '{profile}', choose one of:"
+                f" {', '.join(cfg.python.pyenv.profiles)}."
+            )
+        if sys.platform != "win32":
+            # Interpreters built with different profiles must coexist.
+            cfg.python.inst_dir = f"{cfg.python.inst_dir}-{profile}"
+
+    if cfg.python.trace:
+        atexit.register(_write_trace, interpolate1(cfg.python.trace))
+
     if exists(cfg.python.python):
-        cfg.python.site_packages = get_site_packages(interpreter=cfg.python.python)
+        cfg.python.site_packages = Path(get_venv_info(cfg)["purelib"])
 
     if cfg.python.aws_auth.enabled:
         _check_aws_token_validity(cfg)
 
 
+def discover_interpreter(
+    cfg: ConfigTree, key: str, discover: Callable[[], Union[str, Path, None]]
+) -> str:
+    """
+    Return the interpreter found by `discover` for `key`, e.g. the Python
+    version. The result is cached in {python.discovery} and reused as long as
+    the stat signature of the interpreter doesn't change, so that `discover`
+    doesn't need to spawn subprocesses on every spin invocation.
+    """
+    discovery = interpolate1(cfg.python.discovery)
+    try:
+        with open(discovery, encoding="utf-8") as fd:
+            cache = json.load(fd)
+    except (OSError, ValueError):
+        cache = {}
+    if entry := cache.get(key):
+        try:
+            if _stat_signature(entry["path"]) == entry["signature"]:
+                return entry["path"]  # type: ignore[no-any-return]
+        except OSError:
+            pass
+
+    if not (interpreter := discover()):
+        return ""
+    interpreter = str(interpreter)
+    try:
+        cache[key] = {
+            "path": interpreter,
+            "signature": _stat_signature(interpreter),
+        }
+    except OSError:
+        return interpreter
+    mkdir(os.path.dirname(discovery))
+    with open(discovery, mode="w", encoding="utf-8") as fd:
+        json.dump(cache, fd)
+    return interpreter
+
+
+def which_interpreter(cfg: ConfigTree) -> str:
+    """
+    Return the full path of {python.interpreter}, which might be a name to
+    be looked up in PATH, or an empty string if it can't be found.
+    """
+    interpreter = interpolate1(cfg.python.interpreter)
+    if os.path.isabs(interpreter):
+        return interpreter if exists(interpreter) else ""
+    return discover_interpreter(
+        cfg,
+        f"which:{interpreter}:{os.environ.get('PATH', '')}",
+        lambda: shutil.which(interpreter),
+    )
+
+
+# The wall-clock spans recorded by span(), as Chrome trace events
+SPANS: list[dict] = []
+
+
+@contextmanager
+def span(name: str, category: str = "phase") -> Generator[None, None, None]:
+    """
+    Record the wall-clock time spent within the context as span `name`. The
+    spans are written to {python.trace} when spin exits, if set.
+    """
+    start = time.perf_counter_ns()
+    timestamp = time.time_ns() // 1000
+    try:
+        yield
+    finally:
+        SPANS.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": timestamp,
+                "dur": (time.perf_counter_ns() - start) // 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+        )
+
+
+def _write_trace(trace: str) -> None:
+    """
+    Write the recorded spans to `trace` in the Chrome trace event format and
+    print a summary table of the time spent per span.
+    """
+    if not SPANS:
+        return
+    with open(trace, mode="w", encoding="utf-8") as fd:
+        json.dump({"traceEvents": SPANS, "displayTimeUnit": "ms"}, fd)
+
+    summary: dict[str, list] = {}
+    for event in SPANS:
+        entry = summary.setdefault(event["name"], [event["cat"], 0, 0])
+        entry[1] += 1
+        entry[2] += event["dur"]
+    width = max(len(name) for name in summary)
+    echo(f"{'Span':<{width}}  {'Category':<8}  {'Count':>5}  {'Seconds':>9}")
+    for name, (category, count, duration) in sorted(
+        summary.items(), key=lambda item: item[1][2], reverse=True
+    ):
+        echo(f"{name:<{width}}  {category:<8}  {count:>5}  {duration / 1e6:>9.3f}")
+    echo(f"Trace written to {trace}")
+
+
+def _load_history(history: str) -> dict[str, list[float]]:
+    """Load the durations of the spans of the last provisions."""
+    try:
+        with open(history, encoding="utf-8") as fd:
+            return json.load(fd)  # type: ignore[no-any-return]
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_history(history: str, keep: int = 10) -> None:
+    """Add the durations of the spans of this run to `history`."""
+    if not SPANS:
+        return
+    durations = _load_history(history)
+    for event in SPANS:
+        entries = durations.setdefault(event["name"], [])
+        entries.append(event["dur"] / 1e6)
+        del entries[:-keep]
+    with open(history, mode="w", encoding="utf-8") as fd:
+        json.dump(durations, fd)
+
+
+SUITES_QUERY = "SELECT DISTINCT suite FROM run ORDER BY suite"
+
+# The durations of each test of a suite in its last runs, most recent first
+DURATIONS_QUERY = """
+SELECT test, duration FROM (
+    SELECT test, duration, ROW_NUMBER() OVER (
+        PARTITION BY test ORDER BY run DESC
+    ) AS age
+    FROM duration JOIN run ON run.id = duration.run
+    WHERE run.suite = ?
+) WHERE age <= ? ORDER BY test, age
+"""
+
+
+def _test_durations_db(cfg: ConfigTree) -> sqlite3.Connection:
+    """Open the database of test durations {python.test_durations.path}."""
+    db = sqlite3.connect(interpolate1(cfg.python.test_durations.path))
+    db.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS run (
+            id INTEGER PRIMARY KEY, suite TEXT, started REAL
+        );
+        CREATE TABLE IF NOT EXISTS duration (
+            run INTEGER,
+            test TEXT,
+            duration REAL
+        );
+        CREATE INDEX IF NOT EXISTS duration_run ON duration (run);
+        """
+    )
+    return db
+
+
+def load_test_durations(cfg: ConfigTree, suite: str) -> dict[str, float]:
+    """
+    Return the median durations of the tests of `suite` during their last
+    {python.test_durations.window} runs.
+    """
+    if not exists(cfg.python.test_durations.path):
+        return {}
+    history: dict[str, list[float]] = {}
+    with closing(_test_durations_db(cfg)) as db:
+        for test, duration in db.execute(
+            DURATIONS_QUERY, (suite, int(cfg.python.test_durations.window))
+        ):
+            history.setdefault(test, []).append(duration)
+    return {test: statistics.median(durations) for test, durations in history.items()}
+
+
+def record_test_durations(
+    cfg: ConfigTree, suite: str, durations: dict[str, float]
+) -> list[str]:
+    """
+    Add the `durations` of the tests of a run of `suite` to the database and
+    warn about the tests that took {python.test_durations.threshold} percent
+    longer than usual. Returns the tests that regressed.
+    """
+    if not durations:
+        return []
+    settings = cfg.python.test_durations
+    previous = load_test_durations(cfg, suite)
+    with closing(_test_durations_db(cfg)) as db, db:
+        run_id = db.execute(
+            "INSERT INTO run (suite, started) VALUES (?, ?)", (suite, time.time())
+        ).lastrowid
+        db.executemany(
+            "INSERT INTO duration VALUES (?, ?, ?)",
+            ((run_id, test, duration) for test, duration in durations.items()),
+        )
+        # Forget the oldest runs of the suite
+        db.execute(
+            "DELETE FROM run WHERE suite = ? AND id NOT IN"
+            " (SELECT id FROM run WHERE suite = ? ORDER BY id DESC LIMIT ?)",
+            (suite, suite, int(settings.runs)),
+        )
+        db.execute("DELETE FROM duration WHERE run NOT IN (SELECT id FROM run)")
+
+    if not settings.threshold:
+        return []
+    limit = 1 + float(settings.threshold) / 100
+    regressions = [
+        test
+        for test, duration in durations.items()
+        if test in previous
+        and duration >= float(settings.min_duration)
+        and duration > previous[test] * limit
+    ]
+    for test in regressions:
+        warn(
+            f"{test} took {durations[test]:.2f}s instead of"
+            f" {previous[test]:.2f}s ({durations[test] / previous[test] - 1:+.0%})"
+        )
+    return regressions
+
+
+def junit_durations(reports: Iterable[Union[Path, str]]) -> dict[str, float]:
+    """
+    Return the durations of the test cases in the junit `reports`, keyed by
+    "classname::name".
+    """
+    durations = {}
+    for report in reports:
+        if not exists(report):
+            continue
+        for testcase in ElementTree.parse(report).iter("testcase"):  # nosec
+            durations[f"{testcase.get('classname')}::{testcase.get('name')}"] = float(
+                testcase.get("time", 0)
+            )
+    return durations
+
+
+def behave_durations(report: Union[Path, str]) -> dict[str, float]:
+    """
+    Return the durations of the scenarios in the behave JSON `report`, keyed
+    by "feature::scenario".
+    """
+    if not exists(report):
+        return {}
+    try:
+        features = json.loads(readtext(report))
+    except ValueError:
+        return {}
+    return {
+        f"{feature['name']}::{scenario['name']}": sum(
+            step.get("result", {}).get("duration", 0)
+            for step in scenario.get("steps", [])
+        )
+        for feature in features
+        for scenario in feature.get("elements", [])
+        if scenario.get("type") == "scenario"
+    }
+
+
+def _provision_plan(cfg: ConfigTree) -> list[tuple[str, str]]:
+    """
+    Return the phases of provisioning together with what they would do,
+    based on the current state of the interpreter, the venv and its memo.
+    """
+    provisioner = cfg.python.provisioner or SimpleProvisioner(cfg)
+    rows = []
+
+    if cfg.python.use or which_interpreter(cfg):
+        rows.append(("provision_python", f"use {cfg.python.interpreter}"))
+    elif type(provisioner).provision_python is not ProvisionerProtocol.provision_python:
+        rows.append(("provision_python", f"install via {type(provisioner).__name__}"))
+    elif cfg.python.user_pyenv:
+        rows.append(("pyenv install", f"install {cfg.python.version} via pyenv"))
+    elif sys.platform == "win32":
+        rows.append(("provision_python", f"install {cfg.python.version} via nuget"))
+    elif exists(artifact := _interpreter_artifact(cfg)):
+        rows.append(("restore_interpreter", f"restore from {artifact}"))
+    else:
+        profile = interpolate1(cfg.python.pyenv.profile)
+        rows.append(
+            (
+                "python-build",
+                f"build {cfg.python.version}"
+                + (f" with profile '{profile}'" if profile else ""),
+            )
+        )
+
+    memo = interpolate1(cfg.python.memo)
+    fresh_env = False
+    if exists(cfg.python.venv):
+        rows.append(("venv_provision", f"reuse {cfg.python.venv}"))
+    elif _use_venv_templates(cfg) and exists(
+        template := cfg.python.templates.path / _venv_fingerprint(cfg, provisioner)
+    ):
+        rows.append(("clone_venv", f"clone from {template}"))
+        memo = template / os.path.relpath(memo, interpolate1(cfg.python.venv))
+    else:
+        rows.append(("provision_venv", f"create {cfg.python.venv}"))
+        rows.append(("prerequisites", "install pip"))
+        fresh_env = True
+
+    requirements = set(_get_requirements(cfg))
+    if cfg.python.lock.enabled and exists(cfg.python.lock.path):
+        requirements = {
+            f"--requirement={cfg.python.lock.path}",
+            *filter(_is_local_requirement, requirements),
+        }
+    memoizer_ = Memoizer(memo)
+    if fresh_env or not all(
+        memoizer_.check(constraint) for constraint in _constraints_for_memo(cfg)
+    ):
+        changed = requirements
+    else:
+        changed = SimpleProvisioner._filter(
+            requirements, memoizer_, cfg.spin.project_root
+        )
+    rows.append(
+        (
+            "install",
+            (
+                f"install {len(changed)} new or changed requirements:"
+                f" {' '.join(sorted(changed))}"
+                if changed
+                else "requirements are up to date"
+            ),
+        )
+    )
+
+    for schema in (
+        BashActivate,
+        BatchActivate,
+        BatchDeactivate,
+        PowershellActivate,
+        PythonActivate,
+    ):
+        if fresh_env or exists(schema.activatescript):
+            rows.append(
+                (
+                    f"patch_activate:{schema.__name__}",
+                    f"rewrite {interpolate1(schema.activatescript)}",
+                )
+            )
+
+    if "csspin_python.pytest" in cfg.loaded and cfg.pytest.playwright.enabled:
+        browsers = cfg.pytest.playwright.browsers
+        path = cfg.pytest.playwright.browsers_path
+    elif "csspin_python.playwright" in cfg.loaded:
+        browsers = cfg.playwright.browsers
+        path = cfg.playwright.browsers_path
+    else:
+        browsers = []
+    if browsers:
+        missing = [
+            browser
+            for browser in browsers
+            if not Path(interpolate1(path)).glob(f"{browser}-*")
+        ]
+        rows.append(
+            (
+                "playwright install",
+                (
+                    f"install {' '.join(missing)}"
+                    if missing
+                    else "browsers are up to date"
+                ),
+            )
+        )
+    return rows
+
+
 def init(cfg: ConfigTree) -> None:
     """Initialize the python plugin"""
     if not cfg.python.use:
@@ -368,13 +1451,105 @@ def venv_init(cfg: ConfigTree) -> None:
             echo(f"{cfg.python.scriptdir}\\activate.ps1")
         else:
             echo(f". {cfg.python.scriptdir}/activate")
-        with open(activate_this, encoding="utf-8") as file:
-            exec(  # pylint: disable=exec-used # nosec
-                file.read(), {"__file__": activate_this}
-            )
+        if not _apply_activation(cfg):
+            with open(activate_this, encoding="utf-8") as file:
+                exec(  # pylint: disable=exec-used # nosec
+                    file.read(), {"__file__": activate_this}
+                )
         ACTIVATED = True
 
 
+def _write_activation(cfg: ConfigTree) -> None:
+    """
+    Store the changes the patched activate_this.py applies to the environment
+    and the interpreter in {python.activation}, so they can be applied without
+    executing the script.
+    """
+    activate_this = cfg.python.scriptdir / "activate_this.py"
+    if not exists(activate_this):
+        return
+    venv_info = get_venv_info(cfg)
+    exports = []
+    for name, value in EXPORTS:
+        value = value or ""
+        keys = [
+            key for key in re.findall(r"{(?P<key>\w+?)}", value) if key in os.environ
+        ]
+        exports.append([name, value, keys])
+    activation = {
+        "signature": _stat_signature(activate_this),
+        "prefix": str(cfg.python.venv),
+        "environ": _activation_environ(cfg, readtext(activate_this)),
+        "site_dirs": list(
+            dict.fromkeys(
+                os.path.realpath(venv_info[lib]) for lib in ("purelib", "platlib")
+            )
+        ),
+        "exports": exports,
+    }
+    with open(interpolate1(cfg.python.activation), mode="w", encoding="utf-8") as fd:
+        json.dump(activation, fd)
+
+
+def _activation_environ(cfg: ConfigTree, script: str) -> list:
+    """
+    Return the environment variables set by the activate_this.py script as
+    [name, value, prepend] entries, where prepend marks path lists the value
+    is put in front of.
+    """
+    environ = [
+        ["PATH", str(cfg.python.scriptdir), True],
+        ["VIRTUAL_ENV", str(cfg.python.venv), False],
+    ]
+    if "VIRTUAL_ENV_PROMPT" in script:
+        prompt = os.path.basename(cfg.python.venv)
+        pyvenv_cfg = cfg.python.venv / "pyvenv.cfg"
+        if exists(pyvenv_cfg):
+            for line in readtext(pyvenv_cfg).splitlines():
+                key, _, value = line.partition("=")
+                if key.strip() == "prompt" and value.strip():
+                    prompt = value.strip()
+        environ.append(["VIRTUAL_ENV_PROMPT", prompt, False])
+    if "PKG_CONFIG_PATH" in script:
+        environ.append(
+            ["PKG_CONFIG_PATH", str(cfg.python.venv / "lib" / "pkgconfig"), True]
+        )
+    return environ
+
+
+def _apply_activation(cfg: ConfigTree) -> bool:
+    """
+    Activate the virtual environment using {python.activation} and return
+    whether this succeeded, which is not the case if activate_this.py has
+    changed since the file has been written.
+    """
+    try:
+        with open(interpolate1(cfg.python.activation), encoding="utf-8") as fd:
+            activation = json.load(fd)
+        if activation["prefix"] != str(cfg.python.venv) or activation[
+            "signature"
+        ] != _stat_signature(cfg.python.scriptdir / "activate_this.py"):
+            return False
+    except (OSError, ValueError, KeyError):
+        return False
+
+    for name, value, prepend in activation["environ"]:
+        if prepend and os.environ.get(name):
+            value = os.pathsep.join((value, os.environ[name]))
+        os.environ[name] = value
+    prev_length = len(sys.path)
+    for site_dir in activation["site_dirs"]:
+        site.addsitedir(site_dir)
+    sys.path[:] = sys.path[prev_length:] + sys.path[0:prev_length]
+    sys.real_prefix = sys.prefix  # type: ignore[attr-defined]
+    sys.prefix = activation["prefix"]
+    for name, value, keys in activation["exports"]:
+        for key in keys:
+            value = value.replace(f"{{{key}}}", os.environ.get(key, ""))
+        os.environ[name] = value
+    return True
+
+
 class ActivateScriptPatcher(abc.ABC):
     activatescript: Union[str, Path]
     setpattern: str
@@ -678,6 +1853,56 @@ class PythonActivate(ActivateScriptPatcher):
         return value
 
 
+VENV_INFO_SCRIPT = """
+import json, platform, sys, sysconfig
+print(json.dumps({
+    "purelib": sysconfig.get_path("purelib"),
+    "platlib": sysconfig.get_path("platlib"),
+    "version": platform.python_version(),
+    "soabi": sysconfig.get_config_var("SOABI"),
+    "cache_tag": sys.implementation.cache_tag,
+}))
+"""
+
+
+def _stat_signature(path: Union[Path, str]) -> list[int]:
+    """
+    Return a signature of the file at `path` that changes whenever the file
+    is replaced or modified. Symlinks are part of the signature as well as
+    their targets.
+    """
+    link, target = os.lstat(path), os.stat(path)
+    return [link.st_ino, link.st_mtime_ns, target.st_ino, target.st_mtime_ns]
+
+
+def get_venv_info(cfg: ConfigTree, refresh: bool = False) -> dict:
+    """
+    Return metadata of the venv's interpreter, i.e. the paths of its
+    site-packages, its version and ABI tags.
+
+    Running the interpreter to retrieve this is expensive, thus the metadata
+    is cached in {python.venv_info} and only retrieved again, if the
+    interpreter has changed or `refresh` is set.
+    """
+    interpreter = interpolate1(cfg.python.python)
+    venv_info_path = interpolate1(cfg.python.venv_info)
+    signature = _stat_signature(interpreter)
+    if not refresh:
+        try:
+            with open(venv_info_path, encoding="utf-8") as fd:
+                venv_info = json.load(fd)
+            if venv_info.get("signature") == signature:
+                return venv_info  # type: ignore[no-any-return]
+        except (OSError, ValueError):
+            pass
+
+    venv_info = json.loads(check_output([interpreter, "-c", VENV_INFO_SCRIPT]))
+    venv_info["signature"] = signature
+    with open(venv_info_path, mode="w", encoding="utf-8") as fd:
+        json.dump(venv_info, fd)
+    return venv_info  # type: ignore[no-any-return]
+
+
 def get_site_packages(interpreter: Path) -> Path:
     """Return the path to the virtual environments site-packages."""
     return Path(
@@ -695,7 +1920,8 @@ def get_site_packages(interpreter: Path) -> Path:
 
 def finalize_provision(cfg: ConfigTree) -> None:
     """Patching the activate scripts and preparing the site-packages"""
-    cfg.python.provisioner.install(cfg)
+    with span("install"):
+        cfg.python.provisioner.install(cfg)
 
     for schema in (
         BashActivate,
@@ -704,18 +1930,26 @@ def finalize_provision(cfg: ConfigTree) -> None:
         PowershellActivate,
         PythonActivate,
     ):
-        patch_activate(schema)
-
-    setenv_path = str(cfg.python.site_packages / "_set_env.pth")
-    info(f"Create {setenv_path}")
-    pthline = interpolate1(
-        "import os; "
-        "bindir=r'{python.bindir}'; "
-        "os.environ['PATH'] = "
-        "os.environ['PATH'] if bindir in os.environ['PATH'] "
-        "else os.pathsep.join((bindir, os.environ['PATH']))\n"
-    )
-    writetext(setenv_path, pthline)
+        with span(f"patch_activate:{schema.__name__}"):
+            patch_activate(schema)
+    _write_activation(cfg)
+
+    with span("write_set_env_pth"):
+        setenv_path = str(cfg.python.site_packages / "_set_env.pth")
+        info(f"Create {setenv_path}")
+        pthline = interpolate1(
+            "import os; "
+            "bindir=r'{python.bindir}'; "
+            "os.environ['PATH'] = "
+            "os.environ['PATH'] if bindir in os.environ['PATH'] "
+            "else os.pathsep.join((bindir, os.environ['PATH']))\n"
+        )
+        writetext(setenv_path, pthline)
+
+    _save_digests(cfg)
+    if _use_venv_templates(cfg):
+        with span("store_venv_template"):
+            _store_venv_template(cfg)
 
 
 class ProvisionerProtocol:
@@ -772,6 +2006,16 @@ class ProvisionerProtocol:
     def install(self: Self, cfg: ConfigTree) -> None:
         """Install the requirements"""
 
+    def lock(
+        self: Self, cfg: ConfigTree, requirements: list[str]
+    ) -> list[str]:  # pylint: disable=unused-argument
+        """
+        Resolve `requirements` and return the lines of a requirements file
+        pinning all non-local packages.
+        """
+        die(f"{self.__class__.__name__} does not support lock files.")
+        return []
+
     def cleanup(self: Self, cfg: ConfigTree) -> None:
         """Cleanup the provisioned environment"""
         rmtree(cfg.python.venv)
@@ -781,8 +2025,9 @@ class SimpleProvisioner(ProvisionerProtocol):
     """
     The simplest Python provisioner, using pip.
 
-    This provisioner will never uninstall requirements that are no longer
-    required.
+    Only requirements that have been added or changed since the last
+    provisioning are passed to pip. This provisioner will never uninstall
+    requirements that are no longer required.
     """
 
     def __init__(self: Self, cfg: ConfigTree) -> None:
@@ -803,20 +2048,76 @@ class SimpleProvisioner(ProvisionerProtocol):
             None if cfg.verbosity > Verbosity.NORMAL else "-q",
             "--disable-pip-version-check",
             "install",
-            "--index-url",
-            cfg.python.index_url,
+            *(_index_options(cfg) or ["--index-url", cfg.python.index_url]),
             "-U",
             "pip",
         )
 
     def install(self: Self, cfg: ConfigTree) -> None:
-        if requirements := self._filter(
-            self._requirements, self._m, cfg.spin.project_root
-        ):
-            self._install_command(*self._split(requirements))
+        # The venv might have been cloned from a template including its memo
+        # after the provisioner has been created.
+        self._m = Memoizer(interpolate1("{python.memo}"))
+        all_requirements = self._requirements
+        if locked := _use_lock(cfg):
+            # The lock file contains all non-local packages with their
+            # dependencies, so nothing needs to be resolved.
+            all_requirements = {
+                f"--requirement={cfg.python.lock.path}",
+                *filter(_is_local_requirement, self._requirements),
+            }
+        constraints = _constraints_for_memo(cfg)
+        if not all(self._m.check(constraint) for constraint in constraints):
+            # Changed constraints may affect any requirement
+            requirements = set(all_requirements)
+        else:
+            requirements = self._filter(
+                all_requirements, self._m, cfg.spin.project_root
+            )
+        index_options = _index_options(cfg) + _finish_prefetch(cfg)
+        if requirements and locked:
+            # Packages pinned with hashes can't be mixed with local packages
+            for group in (
+                [req for req in requirements if not _is_local_requirement(req)],
+                [req for req in requirements if _is_local_requirement(req)],
+            ):
+                if group:
+                    self._install_command(
+                        "--no-deps", *index_options, *self._split(group)
+                    )
+        elif requirements:
+            self._install_command(*index_options, *self._split(requirements))
+
+        # Requirements that are no longer required are dropped from the memo,
+        # but not uninstalled.
+        memo_items = [
+            _req_for_memo(req, cfg.spin.project_root) for req in all_requirements
+        ] + constraints
+        if requirements or set(memo_items) != set(self._m.items()):
             self._m.clear()
-            for req in requirements:
-                self._m.add(_req_for_memo(req, cfg.spin.project_root))
+            for item in memo_items:
+                self._m.add(item)
+
+    def lock(self: Self, cfg: ConfigTree, requirements: list[str]) -> list[str]:
+        report = cfg.python.venv / "spinlock.json"
+        sh(
+            "python",
+            "-mpip",
+            "-q",
+            "--disable-pip-version-check",
+            "install",
+            "--dry-run",
+            "--ignore-installed",
+            f"--report={report}",
+            *[
+                f"--constraint={cfg.spin.project_root / constraint}"
+                for constraint in cfg.python.constraints
+            ],
+            *self._split(requirements),
+        )
+        with open(report, encoding="utf-8") as fd:
+            lines = _lock_from_report(json.load(fd))
+        rmtree(report)
+        return lines
 
     @staticmethod
     def _split(requirements: Iterable[str]) -> list[str]:
@@ -834,19 +2135,151 @@ class SimpleProvisioner(ProvisionerProtocol):
         We want to filter all requirements prior to installing them, because we
         only want to run the install, when there are changes, as it takes pip
         quite some time to check, whether it has to do something.
+
+        Only the requirements that have been added or changed since the last
+        install are returned, e.g. a requirement file whose content has
+        changed.
         """
-        if all(memo.check(_req_for_memo(req, project_root)) for req in requirements):
-            return set()
-        else:
-            return requirements
+        return {
+            req
+            for req in requirements
+            if not memo.check(_req_for_memo(req, project_root))
+        }
+
+
+# Maps absolute file names to [size, mtime_ns, inode, digest] and, for
+# requirement files, the files they include, so that the digest and includes
+# of an unchanged file are verified by stat alone.
+DIGESTS: dict[str, list] = {}
+
+
+def _load_digests(cfg: ConfigTree) -> None:
+    """Load the file digests persisted in {python.digests}."""
+    try:
+        with open(interpolate1(cfg.python.digests), encoding="utf-8") as fd:
+            DIGESTS.update(json.load(fd))
+    except (OSError, ValueError):
+        pass
+
+
+def _save_digests(cfg: ConfigTree) -> None:
+    """Persist the file digests that are still valid in {python.digests}."""
+    digests = {}
+    for filename, entry in DIGESTS.items():
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            continue
+        if entry[:3] == [stat.st_size, stat.st_mtime_ns, stat.st_ino]:
+            digests[filename] = entry
+    if exists(cfg.python.venv):
+        with open(interpolate1(cfg.python.digests), mode="w", encoding="utf-8") as fd:
+            json.dump(digests, fd)
 
 
 def _file_hash(filename: Union[Path, str]) -> str:
     """
     Calculate a sha256 hash of a file's content and return its hexdigest.
+
+    The file is read in chunks and the digest is cached as long as size,
+    mtime and inode of the file don't change. Files modified within the last
+    two seconds are not cached, as further modifications might not change
+    their mtime.
     """
+    filename = os.path.abspath(filename)
+    stat = os.stat(filename)
+    key = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+    if (entry := DIGESTS.get(filename)) and entry[:3] == key:
+        return entry[3]  # type: ignore[no-any-return]
+
+    sha = hashlib.sha256()  # nosec: hashlib
     with open(filename, mode="br") as fd:
-        return hashlib.sha256(fd.read()).hexdigest()  # nosec: hashlib
+        while chunk := fd.read(1 << 16):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    if stat.st_mtime_ns < time.time_ns() - 2_000_000_000:
+        DIGESTS[filename] = [*key, digest]
+    return digest
+
+
+def _requirement_files(filename: Union[Path, str]) -> list[str]:
+    """
+    Return the requirement file `filename` and all requirement and constraint
+    files it includes directly or indirectly via ``-r``/``-c``. Includes are
+    resolved relative to the including file, like pip does.
+    """
+    files: list[str] = []
+    pending = [os.path.abspath(filename)]
+    while pending:
+        current = pending.pop(0)
+        if current in files:
+            continue
+        files.append(current)
+        if not exists(current):
+            # pip will complain about missing includes
+            continue
+        pending.extend(_requirement_includes(current))
+    return files
+
+
+def _requirement_includes(filename: str) -> list[str]:
+    """
+    Return the files the requirement file `filename` includes via ``-r``/``-c``.
+    The includes are cached next to the file's digest, so the file is parsed
+    again only when its size, mtime or inode change.
+    """
+    _file_hash(filename)
+    stat = os.stat(filename)
+    entry = DIGESTS.get(filename)
+    if entry and entry[:3] == [stat.st_size, stat.st_mtime_ns, stat.st_ino]:
+        if len(entry) > 4:
+            return entry[4]  # type: ignore[no-any-return]
+    else:
+        entry = None
+
+    pattern = re.compile(
+        r"^(?:--requirement|--constraint)[ =]\s*(?P<filename>\S+)"
+        r"|^-[rc][ =]?\s*(?P<short>\S+)"
+    )
+    includes = []
+    with open(filename, encoding="utf-8") as fd:
+        for line in fd:
+            if (match := pattern.match(line.strip())) and "://" not in (
+                include := match.group("filename") or match.group("short")
+            ):
+                includes.append(
+                    os.path.normpath(os.path.join(os.path.dirname(filename), include))
+                )
+    if entry:
+        entry[4:] = [includes]
+    return includes
+
+
+def _requirement_hash(filename: Union[Path, str]) -> str:
+    """
+    Calculate a hash of a requirement file including all files it includes.
+    For files without includes, this is the hash of the file itself.
+    """
+    files = _requirement_files(filename)
+    if len(files) == 1:
+        return _file_hash(files[0])
+    return hashlib.sha256(  # nosec: hashlib
+        "\n".join(
+            f"{file}:{_file_hash(file) if exists(file) else ''}" for file in files
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def _constraints_for_memo(cfg: ConfigTree) -> list[str]:
+    """
+    Return memoizable representations of the constraint files configured in
+    ``python.constraints``.
+    """
+    return [
+        f"--constraint={constraint}"
+        f"{_requirement_hash(cfg.spin.project_root / constraint)}"
+        for constraint in cfg.python.constraints
+    ]
 
 
 def _split_requirement_option(req: str, project_root: Path) -> Union[Path, None]:
@@ -892,7 +2325,7 @@ def _req_for_memo(
     will be returned.
     """
     if file := _split_requirement_option(req, project_root):
-        return f"{req}{_file_hash(file)}"
+        return f"{req}{_requirement_hash(file)}"
     else:
         return req
 
@@ -901,12 +2334,22 @@ def venv_provision(  # pylint: disable=too-many-branches,missing-function-docstr
     cfg: ConfigTree,
 ) -> None:
     fresh_env = False
+    _load_digests(cfg)
 
     info("Checking venv '{python.venv}'")
     if not exists(cfg.python.venv):
-        info("Provisioning venv '{python.venv}'")
-        cfg.python.provisioner.provision_venv(cfg)
-        fresh_env = True
+        if _use_venv_templates(cfg) and exists(
+            template := cfg.python.templates.path
+            / _venv_fingerprint(cfg, cfg.python.provisioner)
+        ):
+            info(f"Cloning venv '{{python.venv}}' from '{template}'")
+            with span("clone_venv"):
+                _clone_venv(cfg, template)
+        else:
+            info("Provisioning venv '{python.venv}'")
+            with span("provision_venv"):
+                cfg.python.provisioner.provision_venv(cfg)
+            fresh_env = True
 
     # This sets PATH to the venv
     init(cfg)
@@ -915,7 +2358,8 @@ def venv_provision(  # pylint: disable=too-many-branches,missing-function-docstr
 
     # Establish the prerequisites
     if fresh_env:
-        cfg.python.provisioner.prerequisites(cfg)
+        with span("prerequisites"):
+            cfg.python.provisioner.prerequisites(cfg)
 
     # Plugins can define a 'venv_hook' function, to give them a
     # chance to do something with the virtual environment just
@@ -927,18 +2371,384 @@ def venv_provision(  # pylint: disable=too-many-branches,missing-function-docstr
         hook = getattr(plugin_module, "venv_hook", None)
         if hook is not None:
             logging.debug(f"{plugin_module.__name__}.venv_hook()")
-            hook(cfg)
+            with span(f"venv_hook:{plugin_module.__name__}"):
+                hook(cfg)
+
+    for req in _get_requirements(cfg):
+        cfg.python.provisioner.add(cfg, req)
 
-    # Add packages required by the project ('requirements')
-    for req in cfg.python.get("requirements", []):
-        cfg.python.provisioner.add(cfg, interpolate1(req))
 
-    # Install packages required by plugins used
-    # ('<plugin>.requires.python')
+def _get_requirements(cfg: ConfigTree) -> list[str]:
+    """
+    Return the packages required by the project ('requirements') and the
+    packages required by plugins used ('<plugin>.requires.python').
+    """
+    requirements = [interpolate1(req) for req in cfg.python.get("requirements", [])]
     for plugin in cfg.spin.topo_plugins:
         plugin_module = cfg.loaded[plugin]
-        for req in get_requires(plugin_module.defaults, "python"):
-            cfg.python.provisioner.add(cfg, interpolate1(req))
+        requirements.extend(
+            interpolate1(req) for req in get_requires(plugin_module.defaults, "python")
+        )
+    return requirements
+
+
+# The file within a venv template that stores the path of the venv the
+# template has been created from.
+TEMPLATE_ORIGIN = "spin_template_origin"
+
+
+def _use_venv_templates(cfg: ConfigTree) -> bool:
+    """
+    Whether venvs should be cloned from and stored in the template pool.
+    Console scripts on Windows are executables that can't be relocated, thus
+    the pool is not used there.
+    """
+    return bool(cfg.python.templates.enabled) and sys.platform != "win32"
+
+
+def _venv_fingerprint(cfg: ConfigTree, provisioner: ProvisionerProtocol) -> str:
+    """
+    Return a fingerprint of everything that defines the content of the
+    project's venv: the `provisioner`, the interpreter, the requirements
+    (including the content of requirement files and the build metadata of
+    local requirements) and the constraints.
+    """
+    interpreter = str(cfg.python.interpreter)
+    requirements = [
+        (
+            _local_requirement_for_fingerprint(req, cfg.spin.project_root)
+            if _is_local_requirement(req)
+            else _req_for_memo(req, cfg.spin.project_root)
+        )
+        for req in _get_requirements(cfg)
+    ]
+    parts = [
+        provisioner.__class__.__name__,
+        shutil.which(interpreter) or interpreter,
+        *sorted(requirements),
+        *sorted(_constraints_for_memo(cfg)),
+    ]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _local_requirement_for_fingerprint(req: str, project_root: Union[Path, str]) -> str:
+    """
+    Return the local requirement `req` (e.g. ``-e .``) with its path relative
+    to `project_root` and the hashes of the build metadata of the package it
+    refers to, which declares the packages installed for it. Thus, checkouts
+    of the same project at different locations get the same fingerprint.
+    """
+    match = re.fullmatch(
+        r"(?P<option>(?:-e|--editable)[ =]*)?(?P<path>[^\[;\s]+)(?P<rest>.*)",
+        req.strip(),
+    )
+    if not match or "://" in match["path"]:
+        return req
+    root = os.path.realpath(project_root)
+    path = os.path.realpath(os.path.join(root, match["path"]))
+    hashes = [
+        f"{name}:{_file_hash(metadata)}"
+        for name in ("pyproject.toml", "setup.cfg", "setup.py")
+        if os.path.isfile(metadata := os.path.join(path, name))
+    ]
+    return " ".join(
+        (
+            f"{match['option'] or ''}{os.path.relpath(path, root)}{match['rest']}",
+            *hashes,
+        )
+    )
+
+
+def _copy_tree(source: Union[Path, str], target: Union[Path, str]) -> None:
+    """
+    Copy the directory `source` to `target`, using copy-on-write clones where
+    the file system supports it.
+    """
+    if sys.platform == "linux":
+        sh("cp", "-a", "--reflink=auto", source, target)
+    elif sys.platform == "darwin":
+        sh("cp", "-a", "-c", source, target)
+    else:
+        shutil.copytree(source, target, symlinks=True)
+
+
+def _relocate_venv(venv: Path, origin: str) -> None:
+    """
+    Replace the absolute path `origin` of the venv a template has been
+    created from in the scripts, activate scripts and .pth files of `venv`.
+    """
+    old, new = origin.encode("utf-8"), str(venv).encode("utf-8")
+    candidates = [venv / "pyvenv.cfg", *venv.glob("lib/*/site-packages/*.pth")]
+    candidates.extend(path for path in (venv / "bin").iterdir() if path.is_file())
+    for path in candidates:
+        if os.path.islink(path) or not path.is_file():
+            continue
+        content = path.read_bytes()
+        if old in content and b"\0" not in content:
+            path.write_bytes(content.replace(old, new))
+
+
+def _index_options(cfg: ConfigTree) -> list[str]:
+    """
+    Return the options that make the installer use the wheelhouse instead of
+    the package index, if ``python.wheelhouse`` is set.
+    """
+    if not cfg.python.wheelhouse:
+        return []
+    return ["--no-index", f"--find-links={interpolate1(cfg.python.wheelhouse)}"]
+
+
+def _local_requirement_path(req: str, project_root: Path) -> Path:
+    """Return the directory a local requirement like ``-e .`` refers to."""
+    path = re.sub(r"^(-e|--editable)[ =]?", "", req).strip()
+    return project_root / path
+
+
+def _build_requirements(path: Path) -> list[str]:
+    """
+    Return the requirements for building the project in `path`, as declared
+    in the ``[build-system]`` table of its pyproject.toml.
+    """
+    # The PEP 517 default for projects without build-system requirements
+    requires = ["setuptools>=40.8.0"]
+    if exists(pyproject := path / "pyproject.toml"):
+        try:
+            import tomllib  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            try:
+                import tomli as tomllib  # pylint: disable=import-outside-toplevel
+            except ImportError:
+                warn(f"Can't read {pyproject} without tomli on Python < 3.11.")
+                return requires
+        with open(pyproject, mode="rb") as fd:
+            requires = (
+                tomllib.load(fd).get("build-system", {}).get("requires", requires)
+            )
+    return list(requires)
+
+
+# The pip processes downloading the wheels of the lock file in the background
+# and the directory containing their requirement files.
+PREFETCH: list[Popen] = []
+PREFETCH_DIR: list[str] = []
+
+
+def _start_prefetch(cfg: ConfigTree) -> None:
+    """
+    Start downloading the wheels pinned in the lock file to
+    {python.prefetch.path} in the background, so that the downloads overlap
+    with provisioning the interpreter and the venv. The pins are distributed
+    across {python.prefetch.jobs} pip processes run by spin's own interpreter.
+    """
+    if not (
+        cfg.python.prefetch.enabled
+        and not cfg.python.wheelhouse
+        and cfg.python.lock.enabled
+        and exists(cfg.python.lock.path)
+    ):
+        return
+    if not cfg.python.version or importlib.util.find_spec("pip") is None:
+        info("Prefetching wheels requires python.version and pip, skipping.")
+        return
+
+    pins = [
+        line
+        for line in readtext(cfg.python.lock.path).splitlines()
+        if line.strip() and not line.startswith("#")
+    ]
+    jobs = max(1, min(int(cfg.python.prefetch.jobs), len(pins)))
+    mkdir(cfg.python.prefetch.path)
+    PREFETCH_DIR.append(tempfile.mkdtemp(prefix="spinprefetch"))
+    info(f"Prefetching {len(pins)} wheels to {{python.prefetch.path}}")
+    for job in range(jobs):
+        requirements = os.path.join(PREFETCH_DIR[-1], f"{job}.txt")
+        writetext(requirements, "\n".join(pins[job::jobs]) + "\n")
+        PREFETCH.append(
+            Popen(  # pylint: disable=consider-using-with # nosec
+                [
+                    sys.executable,
+                    "-mpip",
+                    "-q",
+                    "--disable-pip-version-check",
+                    "download",
+                    "--no-deps",
+                    "--only-binary=:all:",
+                    f"--python-version={cfg.python.version}",
+                    f"--index-url={interpolate1(cfg.python.index_url)}",
+                    f"--dest={interpolate1(cfg.python.prefetch.path)}",
+                    f"--requirement={requirements}",
+                ],
+                stdout=DEVNULL,
+                stderr=DEVNULL,
+            )
+        )
+
+
+def _finish_prefetch(cfg: ConfigTree) -> list[str]:
+    """
+    Wait for the prefetching to finish and return the options that let the
+    installer use the prefetched wheels.
+    """
+    if not PREFETCH:
+        return []
+    returncodes = [process.wait() for process in PREFETCH]
+    if any(returncodes):
+        info("Some wheels could not be prefetched, they will be downloaded.")
+    _stop_prefetch()
+    return [f"--find-links={interpolate1(cfg.python.prefetch.path)}"]
+
+
+def _stop_prefetch() -> None:
+    """
+    Terminate the prefetching processes that are still running, e.g. when
+    provisioning failed, and remove their requirement files.
+    """
+    for process in PREFETCH:
+        if process.poll() is None:
+            process.terminate()
+    for process in PREFETCH:
+        process.wait()
+    PREFETCH.clear()
+    while PREFETCH_DIR:
+        shutil.rmtree(PREFETCH_DIR.pop(), ignore_errors=True)
+
+
+def _use_lock(cfg: ConfigTree) -> bool:
+    """
+    Whether the requirements are installed from the lock file. Dies if the
+    lock file has been created for other requirements, constraints or another
+    interpreter, as requirements missing from it would not be installed.
+    """
+    if not cfg.python.lock.enabled:
+        return False
+    if not exists(cfg.python.lock.path):
+        warn(
+            f"{cfg.python.lock.path} does not exist, resolving the requirements"
+            " instead. Run 'spin python:lock' to create it."
+        )
+        return False
+    if (
+        f"{LOCK_INPUTS}{_lock_inputs(cfg)}"
+        not in readtext(cfg.python.lock.path).splitlines()[:2]
+    ):
+        die(
+            f"{cfg.python.lock.path} is stale, as the requirements, constraints"
+            " or the Python version changed. Run 'spin python:lock' to update it."
+        )
+    return True
+
+
+# The header line of lock files containing the digest of their inputs
+LOCK_INPUTS = "# inputs: sha256:"
+
+
+def _lock_inputs(cfg: ConfigTree) -> str:
+    """
+    Return a digest of everything the lock file is resolved from: the
+    requirements, the constraints and the Python version and platform.
+    """
+    parts = [
+        str(cfg.python.version),
+        sys.platform,
+        *sorted(
+            (
+                _local_requirement_for_fingerprint(req, cfg.spin.project_root)
+                if _is_local_requirement(req)
+                else _req_for_memo(req, cfg.spin.project_root)
+            )
+            for req in _get_requirements(cfg)
+        ),
+        *sorted(_constraints_for_memo(cfg)),
+    ]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _requirement_for_lock(req: str, project_root: Path) -> str:
+    """
+    Return `req` with the file it refers to made absolute, so it can be
+    resolved from any directory.
+    """
+    if file := _split_requirement_option(req, project_root):
+        option = "--constraint" if req.startswith("-c") else "--requirement"
+        return f"{option}={file.absolute()}"
+    return req
+
+
+def _lock_from_report(report: dict) -> list[str]:
+    """
+    Translate a pip installation report into the lines of a requirements
+    file pinning all packages that are not local directories. Hashes are only
+    included if every pinned package has one, as pip requires hashes for all
+    packages or none.
+    """
+    pins = []
+    for item in report["install"]:
+        download_info = item["download_info"]
+        if "dir_info" in download_info:
+            continue
+        name, version = item["metadata"]["name"], item["metadata"]["version"]
+        if "vcs_info" in download_info:
+            vcs_info = download_info["vcs_info"]
+            pin = (
+                f"{name} @ {vcs_info['vcs']}+{download_info['url']}"
+                f"@{vcs_info['commit_id']}"
+            )
+            digest = None
+        else:
+            pin = (
+                f"{name} @ {download_info['url']}"
+                if item.get("is_direct")
+                else f"{name}=={version}"
+            )
+            digest = (
+                download_info.get("archive_info", {}).get("hashes", {}).get("sha256")
+            )
+        pins.append((pin, digest))
+    pins.sort(key=lambda pin: pin[0].lower())
+    if all(digest for _, digest in pins):
+        return [f"{pin} --hash=sha256:{digest}" for pin, digest in pins]
+    return [pin for pin, _ in pins]
+
+
+def _is_local_requirement(req: str) -> bool:
+    """Whether `req` refers to a package within the file system."""
+    return req.startswith(("-e", "--editable", ".", "/"))
+
+
+def _clone_venv(cfg: ConfigTree, template: Path) -> None:
+    """Create the project's venv by cloning `template`."""
+    origin = readtext(template / TEMPLATE_ORIGIN).strip()
+    _copy_tree(template, cfg.python.venv)
+    rmtree(cfg.python.venv / TEMPLATE_ORIGIN)
+    _relocate_venv(cfg.python.venv, origin)
+
+    # Local requirements (e.g. editable installs) of the template still refer
+    # to the project the template has been created from, so they have to be
+    # installed again.
+    with memoizer(cfg.python.memo) as memo:
+        items = [item for item in memo.items() if not _is_local_requirement(item)]
+        memo.clear()
+        for item in items:
+            memo.add(item)
+
+
+def _store_venv_template(cfg: ConfigTree) -> None:
+    """Add the project's venv to the template pool if not yet present."""
+    template = cfg.python.templates.path / _venv_fingerprint(
+        cfg, cfg.python.provisioner
+    )
+    if exists(template):
+        return
+    info(f"Storing venv '{{python.venv}}' as template '{template}'")
+    mkdir(cfg.python.templates.path)
+    staging = Path(f"{template}.{os.getpid()}")
+    _copy_tree(cfg.python.venv, staging)
+    writetext(staging / TEMPLATE_ORIGIN, str(cfg.python.venv))
+    try:
+        staging.rename(template)
+    except OSError:
+        # Another process stored the same template in the meantime.
+        rmtree(staging)
 
 
 def cleanup(cfg: ConfigTree) -> None:
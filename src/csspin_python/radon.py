@@ -23,6 +23,8 @@ from typing import Iterable
 from csspin import config, info, option, sh, task
 from csspin.tree import ConfigTree
 
+from csspin_python.python import span
+
 defaults = config(
     exe="radon",
     opts=["-n", "{radon.mi_threshold}"],
@@ -58,4 +60,5 @@ def radon(
         files = [f for f in files if f.endswith(".py")]
     if files:
         logging.debug(f"radon: Modified files: {files}")
-        sh("{radon.exe}", "mi", *cfg.radon.opts, *files)
+        with span("radon mi", "sh"):
+            sh("{radon.exe}", "mi", *cfg.radon.opts, *files)
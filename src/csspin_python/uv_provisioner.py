@@ -21,8 +21,10 @@ tool ``uv``. Can only be used if the ``uv`` extra of csspin_python has been
 installed.
 """
 
-import shutil
+import os
 import subprocess
+import sys
+import time
 from typing import Union
 
 try:
@@ -32,15 +34,53 @@ except ImportError:
     import tomli as tomllib
 
 import tomli_w
-from csspin import Command, Path, Verbosity, config, die, info, interpolate1, setenv
+from csspin import (
+    Command,
+    Memoizer,
+    Path,
+    Verbosity,
+    config,
+    die,
+    exists,
+    info,
+    interpolate1,
+    mkdir,
+    option,
+    readtext,
+    rmtree,
+    setenv,
+    task,
+    writetext,
+)
 from csspin.tree import ConfigTree
 
-from csspin_python.python import SimpleProvisioner
+from csspin_python.python import (
+    SimpleProvisioner,
+    _constraints_for_memo,
+    _file_hash,
+    _finish_prefetch,
+    _index_options,
+    _is_local_requirement,
+    _local_requirement_path,
+    _req_for_memo,
+    _requirement_for_lock,
+    _use_lock,
+    discover_interpreter,
+    which_interpreter,
+)
 
 defaults = config(
     enabled=False,
     uv_python_data="{spin.data}/uv_python",
     uv_toml_path="{python.venv}/uv.toml",
+    sync=False,
+    uv_lock="{spin.project_root}/uv.lock",
+    cache=config(
+        path="{spin.data}/uv_cache",
+        link_mode="auto",
+        max_size=0,
+        clean_interval=0,
+    ),
     requires=config(
         spin=[
             "csspin_python.python",
@@ -62,11 +102,25 @@ def configure(cfg: ConfigTree) -> None:
         setenv(
             UV_PYTHON_INSTALL_DIR=interpolate1(cfg.uv_provisioner.uv_python_data),
         )
+        if cfg.uv_provisioner.cache.path:
+            cache = mkdir(interpolate1(cfg.uv_provisioner.cache.path))
+            link_mode = interpolate1(cfg.uv_provisioner.cache.link_mode)
+            if link_mode == "auto":
+                link_mode = _link_mode(cache, interpolate1(cfg.python.venv))
+            # Variables set by the user take precedence. They are only set for
+            # spin's own uv calls and not patched into the activate scripts.
+            os.environ.setdefault("UV_CACHE_DIR", str(cache))
+            os.environ.setdefault("UV_LINK_MODE", link_mode)
         if cfg.python.use:
-            cfg.python.interpreter = shutil.which(interpolate1(cfg.python.interpreter))
+            cfg.python.interpreter = which_interpreter(cfg)
         else:
-            if interpreter_path := _get_uv_python(cfg, True):
-                cfg.python.interpreter = interpreter_path
+            if interpreter_path := discover_interpreter(
+                cfg,
+                f"uv:{cfg.python.version}:"
+                f"{interpolate1(cfg.uv_provisioner.uv_python_data)}",
+                lambda: _get_uv_python(cfg, True),
+            ):
+                cfg.python.interpreter = Path(interpreter_path)
             else:
                 # No uv provisioned python found, set to an empty string to
                 # force provisioning
@@ -77,6 +131,92 @@ def configure(cfg: ConfigTree) -> None:
             _update_index_url_in_toml(cfg)
 
 
+@task("uv:cache-prune", noenv=True)
+def cache_prune(
+    cfg: ConfigTree,
+    max_size: option(  # type: ignore[valid-type]
+        "--max-size",  # noqa: F722,F821
+        type=int,
+        default=None,
+        help="Size of the cache in MiB above which it is cleaned.",  # noqa: F722
+    ),
+    clean_interval: option(  # type: ignore[valid-type]
+        "--clean-interval",  # noqa: F722,F821
+        type=int,
+        default=None,
+        help="Days after which the whole cache is cleaned.",  # noqa: F722
+    ),
+) -> None:
+    """
+    Prune uv's cache, clean it entirely if it exceeds its size budget and
+    periodically every {uv_provisioner.cache.clean_interval} days.
+    """
+    from uv import find_uv_bin
+
+    cache = interpolate1(cfg.uv_provisioner.cache.path)
+    if not cache or not exists(cache):
+        die("There is no uv cache to prune, see uv_provisioner.cache.path.")
+    uv = Command(find_uv_bin(), "cache", f"--cache-dir={cache}")
+    max_size = cfg.uv_provisioner.cache.max_size if max_size is None else max_size
+    clean_interval = (
+        cfg.uv_provisioner.cache.clean_interval
+        if clean_interval is None
+        else clean_interval
+    )
+
+    uv("prune")
+    # uv's cache entries don't track their last use, so they can't be pruned
+    # by age. Instead, the whole cache is cleaned periodically.
+    timestamp = Path(cache) / ".spin-cleaned"
+    if not exists(timestamp):
+        writetext(timestamp, "")
+    if (
+        int(clean_interval)
+        and time.time() - os.stat(timestamp).st_mtime > int(clean_interval) * 86400
+    ):
+        info(
+            f"{cache} has been cleaned more than {clean_interval} days ago, cleaning it"
+        )
+        uv("clean")
+        writetext(mkdir(cache) / ".spin-cleaned", "")
+    elif int(max_size) and (size := _cache_size(cache)) > int(max_size) * 2**20:
+        info(f"{cache} exceeds {max_size} MiB ({size // 2**20} MiB), cleaning it")
+        uv("clean")
+        writetext(mkdir(cache) / ".spin-cleaned", "")
+
+
+def _link_mode(cache: Union[Path, str], venv: Union[Path, str]) -> str:
+    """
+    Return the link mode uv should use for installing packages from `cache`
+    into `venv`: packages can only be hardlinked or cloned within the same
+    file system, otherwise they must be copied.
+    """
+
+    def device(path: str) -> int:
+        while not os.path.exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        return os.stat(path).st_dev
+
+    if device(os.path.abspath(cache)) != device(os.path.abspath(venv)):
+        return "copy"
+    # Clones are copy-on-write copies on APFS, which are as cheap as
+    # hardlinks without sharing modifications with the cache.
+    return "clone" if sys.platform == "darwin" else "hardlink"
+
+
+def _cache_size(cache: Union[Path, str]) -> int:
+    """Return the size of `cache` in bytes, counting hardlinks once."""
+    size = 0
+    inodes = set()
+    for root, _, files in os.walk(cache):
+        for file in files:
+            stat = os.lstat(os.path.join(root, file))
+            if (stat.st_dev, stat.st_ino) not in inodes:
+                inodes.add((stat.st_dev, stat.st_ino))
+                size += stat.st_size
+    return size
+
+
 def _get_uv_python(cfg: ConfigTree, ignore_errors: bool = False) -> Union[Path, None]:
     """Use uv to find its provisioned python interpreter."""
     # We cannot put this import top-level as "spin cleanup" might not work
@@ -158,7 +298,103 @@ class SimpleUvProvisioner(SimpleProvisioner):
         )
 
     def prerequisites(self, cfg: ConfigTree) -> None:
-        self._uv_cmd("pip", "install", "pip")
+        self._uv_cmd("pip", "install", *_index_options(cfg), "pip")
+
+    def install(self, cfg: ConfigTree) -> None:
+        if not cfg.uv_provisioner.sync:
+            super().install(cfg)
+            return
+
+        # In sync mode, the venv is made to match the requirements exactly,
+        # thus the requirement set is only compiled and synced if any of the
+        # requirements, the constraints or the uv.lock changed.
+        index_options = _index_options(cfg) + _finish_prefetch(cfg)
+        self._m = Memoizer(interpolate1("{python.memo}"))
+        requirements = {"pip", *self._requirements}
+        if _use_lock(cfg):
+            requirements = {
+                "pip",
+                f"--requirement={cfg.python.lock.path}",
+                *filter(_is_local_requirement, self._requirements),
+            }
+        memo_items = [
+            _req_for_memo(req, cfg.spin.project_root) for req in requirements
+        ] + _constraints_for_memo(cfg)
+        if uv_lock := exists(cfg.uv_provisioner.uv_lock):
+            memo_items.append(f"uv.lock{_file_hash(cfg.uv_provisioner.uv_lock)}")
+        if set(memo_items) == set(self._m.items()):
+            return
+
+        source = cfg.python.venv / "spinsync.in"
+        output = cfg.python.venv / "spinsync.txt"
+        constraints = [
+            f"--constraint={cfg.spin.project_root / constraint}"
+            for constraint in cfg.python.constraints
+        ]
+        if uv_lock:
+            # The versions pinned in uv.lock constrain the compilation of the
+            # project's and the plugins' requirements.
+            exported = cfg.python.venv / "spinsync-uvlock.txt"
+            self._uv_cmd(
+                "export",
+                f"--project={cfg.spin.project_root}",
+                "--frozen",
+                "--format=requirements-txt",
+                "--no-hashes",
+                "--no-header",
+                "--no-annotate",
+                "--no-emit-workspace",
+                f"--output-file={exported}",
+            )
+            constraints.append(f"--constraint={exported}")
+        writetext(
+            source,
+            "\n".join(
+                _requirement_for_sync(req, cfg.spin.project_root)
+                for req in sorted(requirements)
+            )
+            + "\n",
+        )
+        self._uv_cmd(
+            "pip",
+            "compile",
+            source,
+            f"--output-file={output}",
+            f"--python={cfg.python.python}",
+            "--no-header",
+            *index_options,
+            *constraints,
+        )
+        self._uv_cmd("pip", "sync", *index_options, output)
+        for file in (source, output, cfg.python.venv / "spinsync-uvlock.txt"):
+            rmtree(file)
+
+        self._m.clear()
+        for item in memo_items:
+            self._m.add(item)
+
+    def lock(self, cfg: ConfigTree, requirements: list[str]) -> list[str]:
+        source = cfg.python.venv / "spinlock.in"
+        output = cfg.python.venv / "spinlock.txt"
+        writetext(source, "\n".join(requirements) + "\n")
+        self._uv_cmd(
+            "pip",
+            "compile",
+            source,
+            f"--output-file={output}",
+            f"--python={cfg.python.python}",
+            "--generate-hashes",
+            "--no-header",
+            "--no-annotate",
+            *[
+                f"--constraint={cfg.spin.project_root / constraint}"
+                for constraint in cfg.python.constraints
+            ],
+        )
+        lines = _lock_from_compiled(readtext(output))
+        rmtree(source)
+        rmtree(output)
+        return lines
 
 
 def _configure_uv_toml(cfg: ConfigTree) -> None:
@@ -186,3 +422,34 @@ def _update_index_url_in_toml(cfg: ConfigTree) -> None:
             if toml_content.get("index-url") != cfg.python.index_url:
                 toml_content["index-url"] = cfg.python.index_url
                 tomli_w.dump(toml_content, fd)
+
+
+def _lock_from_compiled(compiled: str) -> list[str]:
+    """
+    Return the lines of a requirements file compiled by ``uv pip compile``,
+    skipping local packages, which are installed separately.
+    """
+    lines = []
+    for line in compiled.replace("\\\n", " ").splitlines():
+        line = " ".join(line.split())
+        if (
+            not line
+            or line.startswith("#")
+            or _is_local_requirement(line)
+            or " @ file:" in line
+            or line.startswith("file:")
+        ):
+            continue
+        lines.append(line)
+    return lines
+
+
+def _requirement_for_sync(req: str, project_root: Path) -> str:
+    """
+    Return `req` as a line of a requirements file that may reside in any
+    directory, i.e. with the file or directory it refers to made absolute.
+    """
+    if _is_local_requirement(req):
+        path = _local_requirement_path(req, project_root).absolute()
+        return f"-e {path}" if req.startswith(("-e", "--editable")) else str(path)
+    return str(_requirement_for_lock(req, project_root))
@@ -139,6 +139,12 @@ TESTCASES = (
         "3.11.9",
         id="uv_provisioner.yaml",
     ),
+    pytest.param(  # pylint: disable=no-member
+        "uv_provisioner_sync.yaml",
+        "python",
+        "3.11.9",
+        id="uv_provisioner_sync.yaml",
+    ),
     pytest.param(  # pylint: disable=no-member
         "uv_provisioner_use.yaml",
         "python",
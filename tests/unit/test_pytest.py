@@ -0,0 +1,287 @@
+# -*- mode: python; coding: utf-8 -*-
+#
+# Copyright (C) 2025 CONTACT Software GmbH
+# All rights reserved.
+# https://www.contact-software.com/
+
+"""Module implementing the unit tests for csspin_python.pytest"""
+
+import os
+import sqlite3
+import sys
+from unittest import mock
+from xml.etree import ElementTree
+
+import pytest
+from click import Abort
+
+# Mock `csspin.task` away as the import fails otherwise, keeping the tasks
+# callable
+with mock.patch("csspin.task", return_value=lambda fn: fn):
+    from csspin_python.pytest import (
+        _record_impact,
+        _run_tests,
+        _snapshot,
+        affected_tests,
+        junit_key,
+        merge_junit,
+        partition,
+        shard_tests,
+        watch_changes,
+    )
+
+
+def test_junit_key():
+    """Test whether junit_key matches the names pytest writes into junit."""
+    assert junit_key("tests/unit/test_a.py::test_b") == "tests.unit.test_a::test_b"
+    assert (
+        junit_key("tests/test_a.py::TestB::test_c[a/b::c]")
+        == "tests.test_a.TestB::test_c[a/b::c]"
+    )
+
+
+def test_partition():
+    """
+    Test whether partition balances the recorded durations and distributes
+    every test exactly once.
+    """
+    tests = [f"tests/test_a.py::test_{index}" for index in range(6)]
+    durations = {
+        "tests.test_a::test_0": 10.0,
+        "tests.test_a::test_1": 6.0,
+        "tests.test_a::test_2": 4.0,
+        "tests.test_a::test_3": 3.0,
+        "tests.test_a::test_4": 3.0,
+    }
+    buckets = partition(tests, durations, 2)
+    assert buckets == [
+        ["tests/test_a.py::test_0", "tests/test_a.py::test_5"],
+        [
+            "tests/test_a.py::test_1",
+            "tests/test_a.py::test_2",
+            "tests/test_a.py::test_3",
+            "tests/test_a.py::test_4",
+        ],
+    ]
+    assert partition(tests, durations, 2) == buckets
+    assert sorted(sum(partition(tests, {}, 4), [])) == tests
+
+
+@mock.patch("csspin_python.pytest.echo", mock.MagicMock())
+@mock.patch("csspin_python.pytest.load_test_durations", mock.MagicMock(return_value={}))
+def test_shard_tests(tmp_path, monkeypatch):
+    """
+    Test whether the shards cover all tests exactly once and are balanced by
+    the size of the test files without recorded durations.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "test_large.py").write_text("x" * 3000)
+    (tmp_path / "test_small.py").write_text("x" * 1000)
+    tests = [f"test_large.py::test_{index}" for index in range(3)] + [
+        f"test_small.py::test_{index}" for index in range(3)
+    ]
+    shards = [shard_tests(mock.MagicMock(), "pytest", f"{i}/2", tests) for i in (1, 2)]
+    assert sorted(shards[0] + shards[1]) == sorted(tests)
+    assert [len(shard) for shard in shards] == [2, 4]
+
+    with (
+        mock.patch("csspin_python.pytest.die", side_effect=Abort),
+        pytest.raises(Abort),
+    ):
+        shard_tests(mock.MagicMock(), "pytest", "3/2", tests)
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+@mock.patch("csspin_python.pytest.echo", mock.MagicMock())
+@mock.patch("csspin_python.pytest.load_test_durations", mock.MagicMock(return_value={}))
+def test__run_tests_shard(tmp_path):
+    """
+    Test whether a shard runs only its tests and doesn't record durations, as
+    all shards must be balanced by the same durations.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.pytest.worker_dir = tmp_path / "workers"
+    cfg_mock.pytest.test_report = str(tmp_path / "pytest.xml")
+    tests = [f"tests/test_a.py::test_{index}" for index in range(4)]
+
+    with (
+        mock.patch("csspin_python.pytest.collect_tests", return_value=tests),
+        mock.patch("csspin_python.pytest.sh") as sh_mock,
+        mock.patch("csspin_python.pytest.record_test_durations") as record_mock,
+    ):
+        _run_tests(
+            cfg_mock,
+            ["pytest"],
+            [],
+            selection=["tests"],
+            coverage=False,
+            with_test_report=True,
+            affected=False,
+            shard="1/2",
+            workers=1,
+        )
+
+    assert sh_mock.call_args.args[-1] == f"@{tmp_path / 'workers' / 'selection.args'}"
+    assert len((tmp_path / "workers" / "selection.args").read_text().split()) == 2
+    record_mock.assert_not_called()
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+@mock.patch("csspin_python.pytest.echo", mock.MagicMock())
+@mock.patch("csspin_python.pytest.load_test_durations", mock.MagicMock(return_value={}))
+def test__run_tests_shard_affected(tmp_path):
+    """
+    Test whether the tests are sharded before selecting the affected ones, so
+    that the shards of all nodes form a partition of the tests.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.pytest.worker_dir = tmp_path / "workers"
+    tests = [f"tests/test_a.py::test_{index}" for index in range(4)]
+
+    with (
+        mock.patch("csspin_python.pytest.collect_tests", return_value=tests),
+        mock.patch(
+            "csspin_python.pytest.affected_tests", side_effect=lambda cfg, tests: []
+        ) as affected_mock,
+        mock.patch("csspin_python.pytest.sh") as sh_mock,
+    ):
+        _run_tests(
+            cfg_mock,
+            ["pytest"],
+            [],
+            selection=["tests"],
+            coverage=False,
+            with_test_report=False,
+            affected=True,
+            shard="2/2",
+            workers=1,
+        )
+
+    assert affected_mock.call_args.args[1] == shard_tests(
+        cfg_mock, "pytest", "2/2", tests
+    )
+    sh_mock.assert_not_called()
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+def test_merge_junit(tmp_path):
+    """Test whether merge_junit collects the test suites of all reports."""
+    (tmp_path / "a.xml").write_text(
+        '<testsuites><testsuite name="pytest" tests="2"/></testsuites>'
+    )
+    (tmp_path / "b.xml").write_text('<testsuite name="pytest" tests="1"/>')
+    merge_junit(
+        [tmp_path / "a.xml", tmp_path / "b.xml", tmp_path / "missing.xml"],
+        tmp_path / "merged.xml",
+    )
+    root = ElementTree.parse(tmp_path / "merged.xml").getroot()
+    assert root.tag == "testsuites"
+    assert [suite.get("tests") for suite in root] == ["2", "1"]
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+def test_affected_tests(tmp_path):
+    """
+    Test whether affected_tests selects the tests touching changed files and
+    the new tests, and falls back to all tests if a trigger changed.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.spin.project_root = tmp_path
+    cfg_mock.pytest.impact.path = str(tmp_path / ".spin" / "impact.json")
+    cfg_mock.pytest.impact.triggers = ["conftest.py"]
+    (tmp_path / ".spin").mkdir()
+    for name in ("a.py", "b.py", "conftest.py"):
+        (tmp_path / name).write_text("")
+
+    data_file = tmp_path / ".coverage"
+    with sqlite3.connect(data_file) as db:
+        db.executescript(
+            "CREATE TABLE file (id INTEGER PRIMARY KEY, path TEXT);"
+            "CREATE TABLE context (id INTEGER PRIMARY KEY, context TEXT);"
+            "CREATE TABLE line_bits (file_id INTEGER, context_id INTEGER);"
+            "CREATE TABLE arc (file_id INTEGER, context_id INTEGER);"
+            f"INSERT INTO file VALUES (1, '{tmp_path / 'a.py'}');"
+            f"INSERT INTO file VALUES (2, '{tmp_path / 'b.py'}');"
+            "INSERT INTO file VALUES (3, '/usr/lib/python3/os.py');"
+            "INSERT INTO context VALUES (1, '');"
+            "INSERT INTO context VALUES (2, 'test_a.py::test_a|run');"
+            "INSERT INTO context VALUES (3, 'test_b.py::test_b|setup');"
+            "INSERT INTO line_bits VALUES (1, 1), (1, 2), (3, 2), (2, 1);"
+            "INSERT INTO arc VALUES (2, 3);"
+        )
+    _record_impact(cfg_mock, [data_file], partial=False)
+
+    tests = ["test_a.py::test_a", "test_b.py::test_b", "test_c.py::test_c"]
+    assert affected_tests(cfg_mock, tests) == ["test_c.py::test_c"]
+    (tmp_path / "b.py").write_text("changed = True\n")
+    assert affected_tests(cfg_mock, tests) == ["test_b.py::test_b", "test_c.py::test_c"]
+    (tmp_path / "conftest.py").write_text("changed = True\n")
+    assert affected_tests(cfg_mock, tests) is None
+
+
+@mock.patch("csspin_python.pytest.info", mock.MagicMock())
+@mock.patch.dict(sys.modules, {"watchdog.events": None, "watchdog.observers": None})
+def test_watch_changes(tmp_path):
+    """
+    Test whether watch_changes reports the changed, added and removed Python
+    files, ignoring other files and hidden directories.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.spin.project_root = tmp_path
+    cfg_mock.pytest.impact.triggers = ["pyproject.toml"]
+    cfg_mock.pytest.watch.interval = 0.01
+    cfg_mock.pytest.watch.debounce = 0.01
+    (tmp_path / "src").mkdir()
+    (tmp_path / ".spin").mkdir()
+    (tmp_path / "src" / "a.py").write_text("")
+    (tmp_path / "src" / "b.py").write_text("")
+
+    changes = watch_changes(cfg_mock, _snapshot(cfg_mock))
+    (tmp_path / "src" / "a.py").write_text("changed = True\n")
+    (tmp_path / "src" / "b.py").unlink()
+    (tmp_path / "src" / "c.py").write_text("")
+    (tmp_path / "README.rst").write_text("")
+    (tmp_path / ".spin" / "d.py").write_text("")
+    assert next(changes) == {
+        os.path.join("src", "a.py"),
+        os.path.join("src", "b.py"),
+        os.path.join("src", "c.py"),
+    }
+
+    (tmp_path / "pyproject.toml").write_text("")
+    assert next(changes) == {"pyproject.toml"}
+    changes.close()
+
+
+def test_watch_changes_observer(tmp_path):
+    """
+    Test whether watch_changes starts the watchdog observer right away and
+    reports changes that happened before the first iteration without waiting
+    for further events.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.spin.project_root = tmp_path
+    cfg_mock.pytest.impact.triggers = []
+    cfg_mock.pytest.watch.debounce = 0.01
+    (tmp_path / "a.py").write_text("")
+    observer = mock.MagicMock()
+    watchdog = mock.MagicMock()
+    watchdog.events.FileSystemEventHandler = object
+    watchdog.observers.Observer.return_value = observer
+
+    with mock.patch.dict(
+        sys.modules,
+        {
+            "watchdog": watchdog,
+            "watchdog.events": watchdog.events,
+            "watchdog.observers": watchdog.observers,
+        },
+    ):
+        changes = watch_changes(cfg_mock, _snapshot(cfg_mock))
+    observer.start.assert_called_once()
+
+    # E.g. a change while running the tests for the first time
+    (tmp_path / "a.py").write_text("changed = True\n")
+    assert next(changes) == {"a.py"}
+    changes.close()
+    observer.stop.assert_called_once()
@@ -6,17 +6,64 @@
 
 """Module implementing the unit tests for csspin_python"""
 
+import json
+import os
+import pickle
+import platform
 import re
+import shutil
+import subprocess
 import sys
+import sysconfig
 from contextlib import nullcontext
 from unittest import mock
 
 import pytest
 from click import Abort
+from csspin import Verbosity
 
-# Mock `csspin.task` away as the import fails otherwise
-with mock.patch("csspin.task"):
-    from csspin_python.python import _configure_pipconf, _split_requirement_option
+# Mock `csspin.task` away as the import fails otherwise, keeping the tasks
+# callable
+with mock.patch("csspin.task", return_value=lambda fn: fn):
+    from csspin_python.python import (
+        SimpleProvisioner,
+        _apply_activation,
+        _build_env,
+        _build_requirements,
+        _build_target,
+        _build_wheel,
+        _checkout_pyenv,
+        _configure_pipconf,
+        _file_hash,
+        _finish_prefetch,
+        _index_options,
+        _interpreter_artifact,
+        _lock_from_report,
+        _pack_interpreter,
+        _provision_plan,
+        _python_build_env,
+        _relocate_venv,
+        _req_for_memo,
+        _requirement_files,
+        _requirement_hash,
+        _restore_interpreter,
+        _split_requirement_option,
+        _start_prefetch,
+        _stop_prefetch,
+        _use_lock,
+        _venv_fingerprint,
+        _write_activation,
+        _write_trace,
+        behave_durations,
+        configure,
+        discover_interpreter,
+        get_venv_info,
+        load_test_durations,
+        lock,
+        record_test_durations,
+        span,
+        wheelhouse,
+    )
 
 
 @pytest.mark.parametrize(
@@ -89,3 +136,870 @@ def test__split_requirement_option(tmp_path, requirement, expected_filename, con
             _split_requirement_option(requirement, tmp_path)
             == tmp_path / expected_filename
         )
+
+
+def test_simple_provisioner__filter(tmp_path):
+    """
+    Test whether SimpleProvisioner._filter only returns the requirements that
+    have been added or changed since the last install.
+    """
+    requirement_file = tmp_path / "requirements.txt"
+    requirement_file.write_text("pytest\n")
+    requirements = {"build", "wheel", "-r requirements.txt"}
+
+    memo = mock.MagicMock()
+    memo_items = [_req_for_memo(req, tmp_path) for req in requirements]
+    memo.check.side_effect = lambda item: item in memo_items
+
+    assert not SimpleProvisioner._filter(requirements, memo, tmp_path)
+    assert SimpleProvisioner._filter(requirements | {"pip"}, memo, tmp_path) == {"pip"}
+
+    requirement_file.write_text("pytest\ncoverage\n")
+    assert SimpleProvisioner._filter(requirements, memo, tmp_path) == {
+        "-r requirements.txt"
+    }
+
+
+@mock.patch("csspin_python.python.setenv", mock.MagicMock())
+@mock.patch("csspin_python.python.exists", mock.MagicMock(return_value=False))
+def test_configure_user_pyenv(tmp_path):
+    """
+    Test whether configure uses the interpreter of the user's pyenv and
+    ignores the build profile in this case.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.verbosity = Verbosity.NORMAL
+    cfg_mock.python.use = None
+    cfg_mock.python.version = "3.11.9"
+    cfg_mock.python.user_pyenv = True
+    cfg_mock.python.pyenv.profile = "optimized"
+    cfg_mock.python.inst_dir = "/spin/python/3.11.9"
+    cfg_mock.python.discovery = str(tmp_path / "interpreters.json")
+    cfg_mock.python.trace = None
+    cfg_mock.python.aws_auth.enabled = False
+
+    with (
+        mock.patch(
+            "csspin_python.python.backtick",
+            return_value="/home/user/.pyenv/versions/3.11.9/bin/python\n",
+        ) as backtick_mock,
+        mock.patch("csspin_python.python.warn") as warn_mock,
+    ):
+        configure(cfg_mock)
+
+    assert "pyenv which python" in backtick_mock.call_args.args[0]
+    assert cfg_mock.python.interpreter == "/home/user/.pyenv/versions/3.11.9/bin/python"
+    assert cfg_mock.python.inst_dir == "/spin/python/3.11.9"
+    warn_mock.assert_called_once()
+
+
+def test__relocate_venv(tmp_path):
+    """
+    Test whether _relocate_venv replaces the path of the template's origin in
+    text files only.
+    """
+    origin = "/home/developer/project/.spin/venv"
+    venv = tmp_path / "venv"
+    site_packages = venv / "lib" / "python3.11" / "site-packages"
+    site_packages.mkdir(parents=True)
+    (venv / "bin").mkdir()
+    (venv / "pyvenv.cfg").write_text("home = /usr/bin\n")
+    (venv / "bin" / "activate").write_text(f"VIRTUAL_ENV='{origin}'\n")
+    (venv / "bin" / "pytest").write_text(f"#!{origin}/bin/python\n")
+    (venv / "bin" / "binary").write_bytes(f"\0{origin}".encode())
+    (site_packages / "_set_env.pth").write_text(f"bindir=r'{origin}/bin'\n")
+
+    _relocate_venv(venv, origin)
+
+    assert (venv / "bin" / "activate").read_text() == f"VIRTUAL_ENV='{venv}'\n"
+    assert (venv / "bin" / "pytest").read_text() == f"#!{venv}/bin/python\n"
+    assert (venv / "bin" / "binary").read_bytes() == f"\0{origin}".encode()
+    assert (site_packages / "_set_env.pth").read_text() == f"bindir=r'{venv}/bin'\n"
+
+
+def test__venv_fingerprint(tmp_path):
+    """
+    Test whether _venv_fingerprint matches for checkouts of the same project
+    at different locations, but distinguishes projects with different build
+    metadata for the same local requirements.
+    """
+
+    def fingerprint(project_root):
+        cfg_mock = mock.MagicMock()
+        cfg_mock.spin.project_root = project_root
+        cfg_mock.python.interpreter = sys.executable
+        cfg_mock.python.constraints = []
+        with mock.patch(
+            "csspin_python.python._get_requirements",
+            return_value=["-e .", "pytest"],
+        ):
+            return _venv_fingerprint(cfg_mock, mock.MagicMock())
+
+    for name, project in (("a", "a"), ("worktree", "a"), ("b", "b")):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "pyproject.toml").write_text(
+            f'[project]\nname = "{project}"\n'
+        )
+
+    assert fingerprint(tmp_path / "a") == fingerprint(tmp_path / "worktree")
+    assert fingerprint(tmp_path / "a") != fingerprint(tmp_path / "b")
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+@mock.patch("csspin_python.python.info", mock.MagicMock())
+def test__pack_and_restore_interpreter(tmp_path):
+    """
+    Test whether an archived interpreter can be restored and whether the
+    archive depends on the installation directory.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.version = "3.11.9"
+    cfg_mock.python.inst_dir = tmp_path / "python" / "3.11.9"
+    cfg_mock.python.artifacts.path = tmp_path / "artifacts"
+    (cfg_mock.python.inst_dir / "bin").mkdir(parents=True)
+    (cfg_mock.python.inst_dir / "bin" / "python").write_text("interpreter")
+
+    assert not _restore_interpreter(cfg_mock)
+    _pack_interpreter(cfg_mock)
+    assert _interpreter_artifact(cfg_mock).exists()
+
+    shutil.rmtree(cfg_mock.python.inst_dir)
+    assert _restore_interpreter(cfg_mock)
+    assert (cfg_mock.python.inst_dir / "bin" / "python").read_text() == "interpreter"
+
+    # A truncated archive must not leave a partial interpreter behind
+    artifact = _interpreter_artifact(cfg_mock)
+    artifact.write_bytes(artifact.read_bytes()[:-60])
+    shutil.rmtree(cfg_mock.python.inst_dir)
+    assert not _restore_interpreter(cfg_mock)
+    assert os.listdir(tmp_path / "python") == []
+    assert not artifact.exists()
+
+    # Files that aren't archives at all make `extract` die
+    artifact.write_text("no archive")
+    with mock.patch("csspin_python.python.warn"):
+        assert not _restore_interpreter(cfg_mock)
+    assert not artifact.exists()
+    assert os.listdir(tmp_path / "python") == []
+
+    cfg_mock.python.inst_dir = tmp_path / "other"
+    assert not _restore_interpreter(cfg_mock)
+
+
+@pytest.mark.parametrize(
+    "profile, version, expected, context",
+    (
+        ("", "3.11.9", {"PYTHON_CFLAGS": "-DOPENSSL_NO_COMP"}, nullcontext()),
+        (
+            "optimized",
+            "3.11.9",
+            {
+                "PYTHON_CFLAGS": "-DOPENSSL_NO_COMP",
+                "PYTHON_CONFIGURE_OPTS": "--enable-optimizations --with-lto",
+                "MAKE_OPTS": "-j4",
+            },
+            nullcontext(),
+        ),
+        (
+            "jit",
+            "3.13.1",
+            {
+                "PYTHON_CFLAGS": "-DOPENSSL_NO_COMP -O3",
+                "PYTHON_CONFIGURE_OPTS": "--enable-experimental-jit",
+            },
+            nullcontext(),
+        ),
+        ("jit", "3.12.8", None, pytest.raises(Abort)),
+    ),
+)
+def test__python_build_env(profile, version, expected, context):
+    """
+    Test whether _python_build_env respects the build profiles.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.version = version
+    cfg_mock.python.pyenv.profile = profile
+    cfg_mock.python.pyenv.profiles = {
+        "optimized": {
+            "configure_opts": ["--enable-optimizations", "--with-lto"],
+            "make_opts": ["-j4"],
+        },
+        "jit": {
+            "configure_opts": ["--enable-experimental-jit"],
+            "cflags": "-O3",
+            "min_version": "3.13",
+        },
+    }
+    with context:
+        assert _python_build_env(cfg_mock) == expected
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+@mock.patch("csspin_python.python.info", mock.MagicMock())
+def test__checkout_pyenv_pinned(tmp_path):
+    """
+    Test whether a pinned pyenv revision is checked out and not fetched again
+    once present.
+    """
+
+    def git(*args, cwd=None):
+        subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+    identity = ("-c", "user.name=spin", "-c", "user.email=spin@localhost")
+    upstream = tmp_path / "upstream"
+    upstream.mkdir()
+    git("init", "-q", cwd=upstream)
+    for version in ("v1", "v2"):
+        (upstream / "version").write_text(version)
+        git("add", "version", cwd=upstream)
+        git(*identity, "commit", "-qm", version, cwd=upstream)
+        git("tag", version, cwd=upstream)
+
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.pyenv.url = str(upstream)
+    cfg_mock.python.pyenv.path = tmp_path / "pyenv"
+    cfg_mock.python.pyenv.revision = "v1"
+    cfg_mock.python.pyenv.shallow = False
+    cfg_mock.python.pyenv.offline = False
+
+    def sh(*cmd, **kwargs):  # pylint: disable=unused-argument
+        subprocess.run([arg for arg in cmd if arg is not None], check=True)
+
+    with mock.patch("csspin_python.python.sh", side_effect=sh) as sh_mock:
+        _checkout_pyenv(cfg_mock)
+        assert (cfg_mock.python.pyenv.path / "version").read_text() == "v1"
+
+        sh_mock.reset_mock()
+        _checkout_pyenv(cfg_mock)
+        sh_mock.assert_not_called()
+
+        cfg_mock.python.pyenv.revision = "v2"
+        _checkout_pyenv(cfg_mock)
+        assert (cfg_mock.python.pyenv.path / "version").read_text() == "v2"
+
+        # Pinning the tip of the remote must populate the work tree as well
+        cfg_mock.python.pyenv.path = tmp_path / "pyenv-tip"
+        _checkout_pyenv(cfg_mock)
+        assert (cfg_mock.python.pyenv.path / "version").read_text() == "v2"
+
+
+def test_get_venv_info(tmp_path):
+    """
+    Test whether get_venv_info only runs the interpreter if its cached
+    metadata is outdated.
+    """
+    interpreter = tmp_path / "python"
+    interpreter.symlink_to(sys.executable)
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.python = interpreter
+    cfg_mock.python.venv_info = tmp_path / "spininfo.json"
+
+    venv_info = get_venv_info(cfg_mock)
+    assert venv_info["version"] == platform.python_version()
+    assert venv_info["purelib"] == sysconfig.get_path("purelib")
+
+    with mock.patch("csspin_python.python.check_output") as check_output_mock:
+        assert get_venv_info(cfg_mock) == venv_info
+        check_output_mock.assert_not_called()
+
+        interpreter.unlink()
+        interpreter.symlink_to(sys.executable)
+        check_output_mock.return_value = json.dumps(venv_info)
+        get_venv_info(cfg_mock)
+        check_output_mock.assert_called_once()
+
+
+def test__write_and_apply_activation(tmp_path, monkeypatch):
+    """
+    Test whether the stored activation is applied as long as activate_this.py
+    is unchanged.
+    """
+    venv = tmp_path / "venv"
+    site_packages = venv / "lib" / "python3.11" / "site-packages"
+    site_packages.mkdir(parents=True)
+    (venv / "bin").mkdir()
+    (venv / "bin" / "activate_this.py").write_text("VIRTUAL_ENV_PROMPT\n")
+    (venv / "pyvenv.cfg").write_text("prompt = project\n")
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.venv = venv
+    cfg_mock.python.scriptdir = venv / "bin"
+    cfg_mock.python.activation = venv / "spinactivate.json"
+
+    monkeypatch.setenv("PATH", "/usr/bin")
+    monkeypatch.setenv("FOO", "foo")
+    for name in ("VIRTUAL_ENV", "VIRTUAL_ENV_PROMPT", "BAR", "BAZ"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    monkeypatch.setattr(sys, "prefix", sys.prefix)
+    monkeypatch.setattr(sys, "real_prefix", None, raising=False)
+    with (
+        mock.patch(
+            "csspin_python.python.get_venv_info",
+            return_value={"purelib": str(site_packages), "platlib": str(site_packages)},
+        ),
+        mock.patch(
+            "csspin_python.python.EXPORTS", [("BAR", "{FOO}:bar"), ("BAZ", None)]
+        ),
+    ):
+        _write_activation(cfg_mock)
+
+    assert _apply_activation(cfg_mock)
+    assert os.environ["PATH"] == f"{venv / 'bin'}{os.pathsep}/usr/bin"
+    assert os.environ["VIRTUAL_ENV"] == str(venv)
+    assert os.environ["VIRTUAL_ENV_PROMPT"] == "project"
+    assert os.environ["BAR"] == "foo:bar"
+    assert os.environ["BAZ"] == ""
+    assert sys.path[0] == os.path.realpath(site_packages)
+    assert sys.prefix == str(venv)
+
+    (venv / "bin" / "activate_this.py").write_text("# changed\n")
+    assert not _apply_activation(cfg_mock)
+
+
+def test__requirement_hash(tmp_path):
+    """
+    Test whether _requirement_hash detects changes in included files and
+    whether unchanged files are verified by their stat only.
+    """
+    (tmp_path / "requirements").mkdir()
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("-r requirements/base.txt\n-c constraints.txt\n")
+    base = tmp_path / "requirements" / "base.txt"
+    base.write_text("--requirement=../extra.txt\npytest\n")
+    (tmp_path / "extra.txt").write_text("build\n")
+    (tmp_path / "constraints.txt").write_text("pytest==8.3.3\n")
+    for file in tmp_path.rglob("*.txt"):
+        os.utime(file, ns=(0, 0))
+
+    digest = _requirement_hash(requirements)
+    assert _requirement_hash(requirements) == digest
+
+    (tmp_path / "extra.txt").write_text("wheel\n")
+    assert _requirement_hash(requirements) != digest
+
+    # Rewriting the file keeping size and mtime doesn't invalidate the cache
+    file_digest = _file_hash(base)
+    base.write_text("--requirement=../extra.txt\nflake8\n")
+    os.utime(base, ns=(0, 0))
+    assert _file_hash(base) == file_digest
+
+    # The includes are parsed again only when the stat of the file changes
+    base.write_text("--requirement=../other.txt\npytest\n")
+    os.utime(base, ns=(0, 0))
+    assert str(tmp_path / "extra.txt") in _requirement_files(requirements)
+    os.utime(base, ns=(0, 1_000_000_000))
+    assert str(tmp_path / "other.txt") in _requirement_files(requirements)
+
+
+@mock.patch("csspin_python.python.echo", mock.MagicMock())
+def test_lock(tmp_path):
+    """
+    Test whether the lock task falls back to the SimpleProvisioner if no
+    provisioner is configured and writes the pins to the lock file.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.provisioner = None
+    cfg_mock.python.version = "3.11.9"
+    cfg_mock.python.lock.enabled = True
+    cfg_mock.python.lock.path = tmp_path / "requirements.lock"
+    cfg_mock.python.constraints = []
+    cfg_mock.spin.project_root = tmp_path
+
+    with (
+        mock.patch(
+            "csspin_python.python.interpolate1", side_effect=lambda value: value
+        ),
+        mock.patch(
+            "csspin_python.python.exists", side_effect=lambda path: os.path.exists(path)
+        ),
+        mock.patch(
+            "csspin_python.python._get_requirements", return_value=["pytest"]
+        ) as requirements_mock,
+        mock.patch("csspin_python.python.SimpleProvisioner") as provisioner_mock,
+    ):
+        provisioner_mock.return_value.lock.return_value = ["pytest==8.3.3"]
+        lock(cfg_mock)
+        assert _use_lock(cfg_mock)
+
+        # Requirements added after locking would not be installed
+        requirements_mock.return_value = ["pytest", "build"]
+        with (
+            mock.patch("csspin_python.python.die", side_effect=Abort) as die_mock,
+            pytest.raises(Abort),
+        ):
+            _use_lock(cfg_mock)
+        assert "is stale" in die_mock.call_args.args[0]
+
+    provisioner_mock.return_value.lock.assert_called_once_with(cfg_mock, ["pytest"])
+    assert cfg_mock.python.lock.path.read_text().splitlines()[2:] == ["pytest==8.3.3"]
+
+
+@pytest.mark.parametrize(
+    "hashes, expected",
+    (
+        (
+            {"sha256": "abc"},
+            [
+                "Build==1.2.2 --hash=sha256:abc",
+                "pytest==8.3.3 --hash=sha256:def",
+            ],
+        ),
+        ({}, ["Build==1.2.2", "pytest==8.3.3"]),
+    ),
+)
+def test__lock_from_report(hashes, expected):
+    """
+    Test whether _lock_from_report pins all non-local packages and only uses
+    hashes if all pinned packages have one.
+    """
+    report = {
+        "install": [
+            {
+                "download_info": {
+                    "url": "https://example.com/pytest-8.3.3-py3-none-any.whl",
+                    "archive_info": {"hashes": {"sha256": "def"}},
+                },
+                "metadata": {"name": "pytest", "version": "8.3.3"},
+            },
+            {
+                "download_info": {"url": "file:///project", "dir_info": {}},
+                "metadata": {"name": "project", "version": "1.0"},
+            },
+            {
+                "download_info": {
+                    "url": "https://example.com/build-1.2.2-py3-none-any.whl",
+                    "archive_info": {"hashes": hashes},
+                },
+                "metadata": {"name": "Build", "version": "1.2.2"},
+            },
+        ]
+    }
+    assert _lock_from_report(report) == expected
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+@mock.patch("csspin_python.python.info", mock.MagicMock())
+def test__start_and_finish_prefetch(tmp_path):
+    """
+    Test whether the pins of the lock file are distributed across the
+    prefetching processes.
+    """
+    lockfile = tmp_path / "requirements.lock"
+    lockfile.write_text("# header\nbuild==1.2.2\npytest==8.3.3\nwheel==0.45.1\n")
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.version = "3.11.9"
+    cfg_mock.python.index_url = "https://pypi.org/simple"
+    cfg_mock.python.lock.path = lockfile
+    cfg_mock.python.prefetch.path = tmp_path / "wheels"
+    cfg_mock.python.prefetch.jobs = 2
+    cfg_mock.python.wheelhouse = None
+
+    chunks = []
+
+    def popen(cmd, **kwargs):  # pylint: disable=unused-argument
+        with open(cmd[-1].split("=", 1)[1], encoding="utf-8") as fd:
+            chunks.append(fd.read().split())
+        assert "--python-version=3.11.9" in cmd
+        return mock.MagicMock(**{"wait.return_value": 0})
+
+    with mock.patch("csspin_python.python.Popen", side_effect=popen):
+        _start_prefetch(cfg_mock)
+    assert chunks == [["build==1.2.2", "wheel==0.45.1"], ["pytest==8.3.3"]]
+    assert _finish_prefetch(cfg_mock) == [f"--find-links={tmp_path / 'wheels'}"]
+    assert not _finish_prefetch(cfg_mock)
+
+    # All processes are waited for, even if one of them failed
+    processes = [
+        mock.MagicMock(**{"wait.return_value": 1}),
+        mock.MagicMock(**{"wait.return_value": 0}),
+    ]
+    with mock.patch("csspin_python.python.Popen", side_effect=processes):
+        _start_prefetch(cfg_mock)
+    with mock.patch("csspin_python.python.info") as info_mock:
+        assert _finish_prefetch(cfg_mock)
+    info_mock.assert_called_once()
+    for process in processes:
+        process.wait.assert_called()
+
+    # Processes still running when provisioning fails are terminated
+    processes = [mock.MagicMock(**{"poll.return_value": None}) for _ in range(2)]
+    with mock.patch("csspin_python.python.Popen", side_effect=processes):
+        _start_prefetch(cfg_mock)
+    _stop_prefetch()
+    for process in processes:
+        process.terminate.assert_called_once()
+        process.wait.assert_called_once()
+    assert not _finish_prefetch(cfg_mock)
+
+
+def test__build_requirements(tmp_path):
+    """
+    Test whether _build_requirements reads the build-system requirements and
+    falls back to the PEP 517 default.
+    """
+    assert _build_requirements(tmp_path) == ["setuptools>=40.8.0"]
+    (tmp_path / "pyproject.toml").write_text(
+        '[build-system]\nrequires = ["hatchling"]\n'
+    )
+    assert _build_requirements(tmp_path) == ["hatchling"]
+
+
+@pytest.mark.parametrize(
+    "wheelhouse, expected",
+    (
+        (None, []),
+        ("/shared/wheelhouse", ["--no-index", "--find-links=/shared/wheelhouse"]),
+    ),
+)
+def test__index_options(wheelhouse, expected):
+    """Test whether _index_options only disables the index for a wheelhouse."""
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.wheelhouse = wheelhouse
+    with mock.patch(
+        "csspin_python.python.interpolate1", side_effect=lambda value: value
+    ):
+        assert _index_options(cfg_mock) == expected
+
+
+@pytest.mark.parametrize(
+    "locked, expected",
+    (
+        (False, [["pip", "hatchling", "{project}[test]", "pytest"]]),
+        (True, [["--requirement=requirements.lock"], ["pip", "hatchling"]]),
+    ),
+)
+def test_wheelhouse(tmp_path, locked, expected):
+    """
+    Test whether the wheelhouse task collects the build requirements of local
+    packages and, unless their dependencies are locked, the packages
+    themselves. The hashed pins of the lock file are collected separately.
+    """
+    (tmp_path / "pyproject.toml").write_text(
+        '[build-system]\nrequires = ["hatchling"]\n'
+    )
+    cfg_mock = mock.MagicMock()
+    cfg_mock.verbosity = Verbosity.NORMAL
+    cfg_mock.python.index_url = "https://pypi.org/simple"
+    cfg_mock.python.lock.path = "requirements.lock"
+    cfg_mock.python.constraints = []
+    cfg_mock.spin.project_root = tmp_path
+
+    with (
+        mock.patch("csspin_python.python._use_lock", return_value=locked),
+        mock.patch(
+            "csspin_python.python._get_requirements",
+            return_value=["-e .[test]", "pytest"],
+        ),
+        mock.patch("csspin_python.python.sh") as sh_mock,
+    ):
+        wheelhouse(cfg_mock, "/shared/wheelhouse")
+
+    calls = []
+    for call in sh_mock.call_args_list:
+        args = list(call.args)
+        start = args.index("--wheel-dir=/shared/wheelhouse") + 1
+        calls.append(args[start:])
+    assert calls == [
+        [arg.format(project=tmp_path) for arg in group] for group in expected
+    ]
+
+
+def test_span_and__write_trace(tmp_path):
+    """
+    Test whether spans are written as Chrome trace events and summarized.
+    """
+    trace = tmp_path / "trace.json"
+    with (
+        mock.patch("csspin_python.python.SPANS", []),
+        mock.patch("csspin_python.python.echo") as echo_mock,
+    ):
+        with span("install"):
+            with span("pip", "sh"):
+                pass
+        with span("pip", "sh"):
+            pass
+        _write_trace(str(trace))
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert [event["name"] for event in events] == ["pip", "install", "pip"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    lines = [call.args[0] for call in echo_mock.call_args_list]
+    assert any(re.match(r"pip\s+sh\s+2\s", line) for line in lines)
+
+
+def test__provision_plan(tmp_path):
+    """
+    Test whether _provision_plan reports the requirements that are not yet
+    installed into an existing venv.
+    """
+    venv = tmp_path / "venv"
+    venv.mkdir()
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.use = None
+    cfg_mock.python.interpreter = sys.executable
+    cfg_mock.python.venv = venv
+    cfg_mock.python.memo = venv / "spininfo.memo"
+    cfg_mock.python.constraints = []
+    cfg_mock.python.lock.enabled = False
+    cfg_mock.python.templates.enabled = False
+    cfg_mock.spin.project_root = tmp_path
+    cfg_mock.loaded = {}
+    with open(cfg_mock.python.memo, mode="wb") as fd:
+        pickle.dump(["pytest"], fd)
+
+    with (
+        mock.patch(
+            "csspin_python.python.interpolate1", side_effect=lambda value: value
+        ),
+        mock.patch(
+            "csspin_python.python._get_requirements", return_value=["pytest", "build"]
+        ),
+        mock.patch(
+            "csspin_python.python.exists", side_effect=lambda path: os.path.exists(path)
+        ),
+    ):
+        rows = dict(_provision_plan(cfg_mock))
+
+    assert rows == {
+        "provision_python": f"use {sys.executable}",
+        "venv_provision": f"reuse {venv}",
+        "install": "install 1 new or changed requirements: build",
+    }
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+def test_discover_interpreter(tmp_path):
+    """
+    Test whether discovered interpreters are cached until their stat
+    signature changes.
+    """
+    interpreter = tmp_path / "python"
+    interpreter.symlink_to(sys.executable)
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.discovery = tmp_path / "cache" / "interpreters.json"
+    discover = mock.MagicMock(return_value=interpreter)
+
+    assert discover_interpreter(cfg_mock, "uv:3.11", discover) == str(interpreter)
+    assert discover_interpreter(cfg_mock, "uv:3.11", discover) == str(interpreter)
+    discover.assert_called_once()
+
+    interpreter.unlink()
+    assert discover_interpreter(cfg_mock, "uv:3.11", lambda: None) == ""
+
+
+def test__build_wheel_logged(tmp_path):
+    """
+    Test whether _build_wheel falls back to setup.py and writes the output of
+    both attempts into the log.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.verbosity = Verbosity.NORMAL
+    cfg_mock.spin.project_root = tmp_path
+    cfg_mock.python.build_envs.enabled = False
+    log = tmp_path / "build.log"
+    log.write_text("previous run\n")
+
+    with mock.patch(
+        "csspin_python.python.run",
+        side_effect=[mock.MagicMock(returncode=1), mock.MagicMock(returncode=0)],
+    ) as run_mock:
+        success, duration = _build_wheel(
+            cfg_mock, tmp_path / "package", tmp_path / "staging", log
+        )
+
+    assert success and duration >= 0
+    assert run_mock.call_args_list[1].kwargs["cwd"] == tmp_path / "package"
+    assert log.read_text() == (
+        "Building PEP 517-like wheel\n"
+        "Building does not seem to work, use legacy setup.py style\n"
+    )
+
+
+def test__build_wheel_isolated_retry(tmp_path):
+    """
+    Test whether _build_wheel retries an isolated build before falling back
+    to setup.py if building in the shared build environment fails.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.verbosity = Verbosity.NORMAL
+    cfg_mock.python.build_envs.enabled = True
+    log = tmp_path / "build.log"
+
+    with (
+        mock.patch("csspin_python.python._build_env", return_value="/env/python"),
+        mock.patch(
+            "csspin_python.python.run",
+            side_effect=[mock.MagicMock(returncode=1), mock.MagicMock(returncode=0)],
+        ) as run_mock,
+    ):
+        success, _ = _build_wheel(
+            cfg_mock, tmp_path / "package", tmp_path / "staging", log
+        )
+
+    assert success
+    assert run_mock.call_args_list[0].args[0][:4] == [
+        "/env/python",
+        "-m",
+        "build",
+        "--no-isolation",
+    ]
+    assert run_mock.call_args_list[1].args[0][:4] == ["python", "-m", "build", "-w"]
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+@mock.patch(
+    "csspin_python.python.get_venv_info",
+    mock.MagicMock(return_value={"version": "3.11.9"}),
+)
+def test__build_env(tmp_path):
+    """
+    Test whether build environments are created once, renamed into place
+    when complete and shared by projects with the same build requirements.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.wheelhouse = None
+    cfg_mock.python.build_envs.path = str(tmp_path / "build_envs")
+    for name, requires in (
+        ("first", '"setuptools", "wheel"'),
+        ("second", '"wheel", "setuptools"'),
+        ("third", '"hatchling"'),
+    ):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "pyproject.toml").write_text(
+            f"[build-system]\nrequires = [{requires}]\n"
+        )
+
+    def create(cmd, cwd, name):  # pylint: disable=unused-argument
+        if name == "create_build_env":
+            os.makedirs(cmd[-1], exist_ok=True)
+        return True
+
+    execute = mock.MagicMock(side_effect=create)
+
+    first = _build_env(cfg_mock, tmp_path / "first", execute)
+    assert _build_env(cfg_mock, tmp_path / "second", execute) == first
+    assert execute.call_count == 2
+    assert execute.call_args.args[0][-3:] == ["build", "setuptools", "wheel"]
+
+    assert _build_env(cfg_mock, tmp_path / "third", execute) != first
+    assert execute.call_count == 4
+    # The environments are created in a staging directory and renamed
+    assert not list((tmp_path / "build_envs").glob("*.*"))
+    assert execute.call_args_list[0].args[0][-1] != first.parent.parent
+
+    execute.side_effect = None
+    execute.return_value = False
+    cfg_mock.python.build_envs.path = str(tmp_path / "broken")
+    assert _build_env(cfg_mock, tmp_path / "first", execute) is None
+    assert not list((tmp_path / "broken").glob("*/spin_build_env"))
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+@mock.patch("csspin_python.python.echo", mock.MagicMock())
+@mock.patch(
+    "csspin_python.python.get_venv_info",
+    mock.MagicMock(return_value={"version": "3.11.9"}),
+)
+def test__build_target_incremental(tmp_path):
+    """
+    Test whether _build_target reuses the previous wheel as long as the
+    sources of the target don't change.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.verbosity = Verbosity.NORMAL
+    cfg_mock.python.index_url = "https://pypi.org/simple"
+    cfg_mock.python.wheel_cache = tmp_path / "cache"
+    cfg_mock.python.build_envs.enabled = False
+    cfg_mock.python.build_envs.path = tmp_path / "build_envs"
+    cfg_mock.spin.project_root = tmp_path / "project"
+    target = tmp_path / "project" / "package"
+    target.mkdir(parents=True)
+    (target / "setup.py").write_text("setup()\n")
+
+    def build_wheel(cfg, build_path, staging, log):  # pylint: disable=unused-argument
+        os.makedirs(staging / "wheels")
+        (staging / "wheels" / "package-1.0-py3-none-any.whl").write_text("wheel")
+        return True, 0.0
+
+    with mock.patch(
+        "csspin_python.python._build_wheel", side_effect=build_wheel
+    ) as build_mock:
+        assert _build_target(cfg_mock, target)[0]
+        assert _build_target(cfg_mock, target)[0]
+        assert build_mock.call_count == 1
+        assert (
+            cfg_mock.spin.project_root / "dist" / "package-1.0-py3-none-any.whl"
+        ).exists()
+
+        (target / "module.py").write_text("")
+        assert _build_target(cfg_mock, target)[0]
+        assert build_mock.call_count == 2
+
+        assert _build_target(cfg_mock, target, force=True)[0]
+        assert build_mock.call_count == 3
+
+        cfg_mock.python.build_envs.enabled = True
+        assert _build_target(cfg_mock, target)[0]
+        assert build_mock.call_count == 4
+
+        # The version derived from git tags is part of the fingerprint
+        with mock.patch("csspin_python.python._git_describe", return_value="v1.1"):
+            assert _build_target(cfg_mock, target)[0]
+        assert build_mock.call_count == 5
+
+
+@mock.patch("csspin.echo", mock.MagicMock())
+def test_record_test_durations(tmp_path):
+    """
+    Test whether the durations of the last runs are kept and tests exceeding
+    the threshold are reported.
+    """
+    cfg_mock = mock.MagicMock()
+    cfg_mock.python.test_durations.path = str(tmp_path / "durations.sqlite")
+    cfg_mock.python.test_durations.window = 3
+    cfg_mock.python.test_durations.runs = 4
+    cfg_mock.python.test_durations.threshold = 50
+    cfg_mock.python.test_durations.min_duration = 0.5
+    assert not load_test_durations(cfg_mock, "pytest")
+
+    for duration in (1.0, 1.2, 0.9, 1.0):
+        assert not record_test_durations(
+            cfg_mock, "pytest", {"a::slow": duration, "a::fast": duration / 10}
+        )
+    record_test_durations(cfg_mock, "behave", {"feature::scenario": 3.0})
+    assert load_test_durations(cfg_mock, "pytest") == {"a::slow": 1.0, "a::fast": 0.1}
+
+    with mock.patch("csspin_python.python.warn") as warn_mock:
+        assert record_test_durations(
+            cfg_mock, "pytest", {"a::slow": 1.6, "a::fast": 0.3}
+        ) == ["a::slow"]
+    warn_mock.assert_called_once_with("a::slow took 1.60s instead of 1.00s (+60%)")
+    assert load_test_durations(cfg_mock, "behave") == {"feature::scenario": 3.0}
+
+
+def test_behave_durations(tmp_path):
+    """Test whether behave_durations sums up the steps of each scenario."""
+    report = tmp_path / "report.json"
+    report.write_text(
+        json.dumps(
+            [
+                {
+                    "name": "Feature",
+                    "elements": [
+                        {"type": "background", "name": "Setup", "steps": []},
+                        {
+                            "type": "scenario",
+                            "name": "Scenario",
+                            "steps": [
+                                {"result": {"duration": 0.5}},
+                                {"result": {"duration": 1.5}},
+                                {"name": "skipped"},
+                            ],
+                        },
+                    ],
+                }
+            ]
+        )
+    )
+    assert behave_durations(report) == {"Feature::Scenario": 2.0}
+    assert not behave_durations(tmp_path / "missing.json")
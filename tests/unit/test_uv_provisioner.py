@@ -0,0 +1,91 @@
+# -*- mode: python; coding: utf-8 -*-
+#
+# Copyright (C) 2025 CONTACT Software GmbH
+# All rights reserved.
+# https://www.contact-software.com/
+
+"""Module implementing the unit tests for csspin_python.uv_provisioner"""
+
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+# Mock `csspin.task` away as the import fails otherwise, keeping the tasks
+# callable
+with mock.patch("csspin.task", return_value=lambda fn: fn):
+    from csspin_python.uv_provisioner import (
+        _cache_size,
+        _link_mode,
+        _lock_from_compiled,
+        _requirement_for_sync,
+    )
+
+
+def test__link_mode(tmp_path):
+    """
+    Test whether _link_mode links within a file system and copies across
+    file systems.
+    """
+    expected = "clone" if sys.platform == "darwin" else "hardlink"
+    assert _link_mode(tmp_path / "cache", tmp_path / "project" / "venv") == expected
+
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "venv").mkdir()
+    with mock.patch(
+        "os.stat",
+        side_effect=lambda path: mock.MagicMock(st_dev=hash(str(path))),
+    ):
+        assert _link_mode(tmp_path / "cache", tmp_path / "venv") == "copy"
+
+
+def test__cache_size(tmp_path):
+    """Test whether _cache_size counts hardlinked files once."""
+    (tmp_path / "wheels").mkdir()
+    (tmp_path / "wheels" / "a").write_bytes(b"x" * 100)
+    (tmp_path / "b").write_bytes(b"x" * 50)
+    os.link(tmp_path / "b", tmp_path / "wheels" / "c")
+    assert _cache_size(tmp_path) == 150
+
+
+def test__lock_from_compiled():
+    """
+    Test whether _lock_from_compiled joins continued lines with their hashes
+    and skips comments and local packages.
+    """
+    compiled = (
+        "-e file:///home/developer/project\n"
+        "build==1.2.2 \\\n"
+        "    --hash=sha256:aaa \\\n"
+        "    --hash=sha256:bbb\n"
+        "    # via -r spinlock.in\n"
+        "cs-local @ file:///home/developer/cs.local\n"
+        "pytest==8.3.3 \\\n"
+        "    --hash=sha256:ccc\n"
+    )
+    assert _lock_from_compiled(compiled) == [
+        "build==1.2.2 --hash=sha256:aaa --hash=sha256:bbb",
+        "pytest==8.3.3 --hash=sha256:ccc",
+    ]
+
+
+@pytest.mark.parametrize(
+    "requirement, expected",
+    (
+        ("-e .", "-e {root}"),
+        ("--editable=./cs.local", "-e {root}/cs.local"),
+        ("./cs.local", "{root}/cs.local"),
+        ("-r requirements.txt", "--requirement={root}/requirements.txt"),
+        ("pytest==8.3.3", "pytest==8.3.3"),
+    ),
+)
+def test__requirement_for_sync(tmp_path, requirement, expected):
+    """
+    Test whether _requirement_for_sync makes local packages and requirement
+    files absolute.
+    """
+    (tmp_path / "requirements.txt").write_text("pytest\n")
+    assert _requirement_for_sync(requirement, tmp_path) == expected.format(
+        root=tmp_path
+    )